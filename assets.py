@@ -0,0 +1,220 @@
+# assets.py
+# Registro central de recursos: fuentes, sprites generados, sonidos e imágenes cargadas de disco.
+# Cada recurso se registra con su receta (la función que lo construye) y se crea la primera vez
+# que se pide; a partir de ahí todos los que lo piden comparten el mismo objeto. Las superficies
+# se convierten al formato del display una sola vez, en cuanto hay display (si se construyeron
+# antes, se convierten al pedirlas la primera vez después).
+#
+# Los recursos se pueden agrupar en conjuntos con nombre (p. ej. "boot") para precalentarlos
+# durante una pantalla de carga, y de cada uno se anota cuánto costó construirlo y cuánta
+# memoria ocupa, para ver qué paga exactamente el arranque:
+#
+#   python assets.py main                  # la versión web
+#   python assets.py space_bluesky_plus    # la de escritorio
+#
+# Una familia de recursos (p. ej. un enemigo por color y frame) se registra una vez con su
+# nombre y se pide con argumentos: get('enemy', color, frame) llama a la receta con
+# (color, frame) y guarda el resultado bajo la clave ('enemy', color, frame). Las familias sin
+# un número fijo de miembros (textos rasterizados, paletas...) se registran con `max_entries`:
+# al pasarse se descarta el recurso de la familia que lleva más tiempo sin pedirse (LRU), así
+# que la memoria no crece sin límite.
+
+import argparse
+import collections
+import importlib
+import os
+import sys
+import time
+
+import pygame
+
+KINDS = ('surface', 'image', 'font', 'sound')
+
+
+class Entry:
+    __slots__ = ('key', 'kind', 'value', 'build_ms', 'nbytes', 'converted')
+
+    def __init__(self, key, kind):
+        self.key = key
+        self.kind = kind
+        self.value = None
+        self.build_ms = 0.0
+        self.nbytes = None
+        # las fuentes y los sonidos no tienen nada que convertir
+        self.converted = kind not in ('surface', 'image')
+
+
+def surface_bytes(surf):
+    return surf.get_pitch() * surf.get_height()
+
+
+def sound_bytes(sound):
+    fmt = pygame.mixer.get_init()
+    if fmt is None:
+        return None
+    freq, size, channels = fmt
+    return int(sound.get_length() * freq) * (abs(size) // 8) * channels
+
+
+class Assets:
+    """Recursos construidos bajo demanda y compartidos, con su coste de construcción."""
+    def __init__(self):
+        self.recipes = {}   # nombre -> (tipo, receta)
+        self.sets = {}      # nombre del conjunto -> claves
+        self.entries = {}   # clave -> Entry
+        self.bounded = {}   # familia acotada -> (max_entries, claves de la menos a la más usada)
+        self.builds = collections.Counter()   # familia -> recursos construidos
+        self.evictions = 0
+
+    # --- registro ---
+    def register(self, name, factory, kind='surface', max_entries=None):
+        if kind not in KINDS:
+            raise ValueError(f"tipo de recurso desconocido: {kind!r} (se espera uno de {', '.join(KINDS)})")
+        self.recipes[name] = (kind, factory)
+        if max_entries is not None:
+            self.bounded[name] = (max_entries, collections.OrderedDict())
+
+    def font(self, name, names, size, bold=False):
+        self.register(name, lambda: pygame.font.SysFont(names, size, bold=bold), kind='font')
+
+    def image(self, name, path, size=None):
+        """Imagen de disco, opcionalmente escalada a `size`. Si no se puede cargar el recurso
+        vale None, y no se vuelve a intentar."""
+        def load():
+            try:
+                img = pygame.image.load(path)
+                return pygame.transform.smoothscale(img, size) if size else img
+            except (pygame.error, OSError, ValueError):
+                return None
+        self.register(name, load, kind='image')
+
+    def define_set(self, set_name, keys):
+        """Conjunto de claves que precalentar juntas; una clave es un nombre o una tupla
+        (nombre, *argumentos)."""
+        self.sets.setdefault(set_name, []).extend(keys)
+
+    # --- uso ---
+    def get(self, name, *args):
+        key = (name,) + args if args else name
+        e = self.entries.get(key)
+        if e is None:
+            e = self._build(key, name, args)
+        else:
+            if not e.converted:
+                self._convert(e)
+            lru = self.bounded.get(name)
+            if lru is not None:
+                lru[1].move_to_end(key)
+        return e.value
+
+    def _build(self, key, name, args):
+        kind, factory = self.recipes[name]
+        e = Entry(key, kind)
+        t0 = time.perf_counter()
+        e.value = factory(*args)
+        e.build_ms = (time.perf_counter() - t0) * 1000
+        if e.value is None:
+            e.converted = True
+            e.nbytes = 0
+        elif kind == 'sound':
+            e.nbytes = sound_bytes(e.value)
+        elif kind != 'font':
+            e.nbytes = surface_bytes(e.value)
+            if not e.converted:
+                self._convert(e)
+        self.entries[key] = e
+        self.builds[name] += 1
+        lru = self.bounded.get(name)
+        if lru is not None:
+            max_entries, order = lru
+            order[key] = None
+            while len(order) > max_entries:
+                del self.entries[order.popitem(last=False)[0]]
+                self.evictions += 1
+        return e
+
+    def _convert(self, e):
+        if pygame.display.get_surface() is None:
+            return
+        t0 = time.perf_counter()
+        surf = e.value
+        e.value = surf.convert_alpha() if surf.get_flags() & pygame.SRCALPHA else surf.convert()
+        e.build_ms += (time.perf_counter() - t0) * 1000
+        e.nbytes = surface_bytes(e.value)
+        e.converted = True
+
+    def prewarm(self, keys, slice_ms=0.0):
+        """Construye `keys` (claves o el nombre de un conjunto). Es un generador para poder
+        repartir el trabajo entre frames de una pantalla de carga: devuelve (hechas, total)
+        cada vez que pasan `slice_ms` ms construyendo (con 0, tras cada recurso) y al final."""
+        if isinstance(keys, str):
+            keys = self.sets[keys]
+        keys = list(keys)
+        total = len(keys)
+        t0 = time.perf_counter()
+        for i, key in enumerate(keys, 1):
+            if isinstance(key, tuple):
+                self.get(*key)
+            else:
+                self.get(key)
+            if i == total or (time.perf_counter() - t0) * 1000 >= slice_ms:
+                yield i, total
+                t0 = time.perf_counter()
+
+    def load(self, keys):
+        """Como prewarm(), de una vez."""
+        for _ in self.prewarm(keys, slice_ms=float('inf')):
+            pass
+
+    # --- informe ---
+    def stats(self):
+        """Un dict por recurso construido, del más caro al más barato."""
+        rows = [{'key': e.key, 'kind': e.kind, 'build_ms': e.build_ms, 'bytes': e.nbytes,
+                 'converted': e.converted}
+                for e in self.entries.values()]
+        rows.sort(key=lambda r: r['build_ms'], reverse=True)
+        return rows
+
+    def report(self):
+        rows = self.stats()
+        out = [f"{'recurso':<40}{'tipo':>8}{'ms':>10}{'KiB':>10}"]
+        for r in rows:
+            key = r['key'] if isinstance(r['key'], str) else ' '.join(str(k) for k in r['key'])
+            kib = '-' if r['bytes'] is None else f"{r['bytes'] / 1024:.1f}"
+            out.append(f"{key[:39]:<40}{r['kind']:>8}{r['build_ms']:>10.2f}{kib:>10}")
+        out.append('')
+        for kind in KINDS:
+            sel = [r for r in rows if r['kind'] == kind]
+            if sel:
+                ms = sum(r['build_ms'] for r in sel)
+                kib = sum(r['bytes'] or 0 for r in sel) / 1024
+                out.append(f"{kind:<10}{len(sel):>4} recursos {ms:>10.2f} ms {kib:>10.1f} KiB")
+        out.append(f"{'total':<10}{len(rows):>4} recursos {sum(r['build_ms'] for r in rows):>10.2f} ms "
+                   f"{sum(r['bytes'] or 0 for r in rows) / 1024:>10.1f} KiB")
+        if self.evictions:
+            out.append(f"{self.evictions} recursos descartados por el límite de su familia")
+        return '\n'.join(out)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Construye los recursos de un módulo del juego y muestra su coste")
+    ap.add_argument('module', help="módulo con un registro ASSETS (main o space_bluesky_plus)")
+    ap.add_argument('--set', dest='sets', action='append', default=None,
+                    help="conjunto a precalentar (por defecto, todos)")
+    args = ap.parse_args(argv)
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.init()
+    mod = importlib.import_module(args.module)
+    pygame.display.set_mode((mod.WIDTH, mod.HEIGHT))
+    registry = mod.ASSETS
+    for name in args.sets or list(registry.sets):
+        if name not in registry.sets:
+            ap.error(f"conjunto desconocido: {name} (hay: {', '.join(registry.sets)})")
+        registry.load(name)
+    print(registry.report())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# benchmarks
+# Scripts de medición de rendimiento. Ejecutar desde la raíz del repo, p.ej.:
+#   python -m benchmarks.bench_synth
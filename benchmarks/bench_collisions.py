@@ -0,0 +1,186 @@
+# bench_collisions.py
+# Compara handle_collisions con groupcollide/spritecollide (la versión de antes de SpatialGrid)
+# contra la fase amplia por rejilla, en un escenario cargado: muchas balas del jugador contra
+# una formación grande, con balas enemigas y power-ups alrededor del jugador.
+# Verifica que el resultado (supervivientes, puntuación, vidas y estado de los RNG) es idéntico.
+#
+#   python -m benchmarks.bench_collisions [--bullets 1000] [--enemies 500] [--repeat 5]
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import space_bluesky_plus as game
+
+
+# ------------------------------
+# Implementación de referencia (la de antes de SpatialGrid)
+# ------------------------------
+def legacy_collisions(g):
+    # las mismas tiradas que handle_collisions, de los RNG de la partida
+    drops = g.rng['drops']
+    fx = g.rng['fx']
+    hits = pygame.sprite.groupcollide(g.enemy_group, g.bullets, dokilla=False, dokillb=True)
+    for enemy, bullets in hits.items():
+        g.add_explosion(enemy.rect.center, enemy.color)
+        enemy.kill()
+        g.score += 10
+        if drops.random() < 0.12:
+            g.powerups.add(game.PowerUp.acquire(enemy.rect.center, kind=drops.choice(game.PowerUp.TYPES)))
+
+    if g.boss_group:
+        boss = g.boss_group.sprite
+        if boss:
+            collisions = pygame.sprite.spritecollide(boss, g.bullets, dokill=True)
+            for _ in collisions:
+                boss.hp -= 5
+                g.add_explosion((boss.rect.centerx + fx.randint(-20,20), boss.rect.centery+fx.randint(-20,20)), (250, 160, 250))
+                g.score += 2
+            if boss and boss.hp <= 0:
+                g.add_explosion(boss.rect.center, (250, 160, 250))
+                g.score += 300
+                boss.kill()
+                if drops.random() < 0.8:
+                    g.powerups.add(game.PowerUp.acquire((game.WIDTH//2, 260), kind=drops.choice(['rapid','shield'])))
+
+    if g.player.alive:
+        # las balas enemigas ya no son sprites: las dos versiones usan BulletField.collide
+        phit = g.enemy_bullets.collide(g.player.rect)
+        if phit:
+            if g.player.shield_timer > 0:
+                g.add_explosion((g.player.rect.centerx, g.player.rect.top), (150, 210, 255))
+            else:
+                g.player.lives -= 1
+                g.add_explosion(g.player.rect.center, (255, 200, 160))
+                if g.player.lives <= 0:
+                    g.player.alive = False
+                    g.state = "gameover"
+
+    for e in list(g.enemy_group):
+        if e.rect.bottom >= g.player.rect.top - 10:
+            g.player.lives = 0
+            g.player.alive = False
+            g.state = "gameover"
+            break
+
+    if g.player.alive:
+        got = pygame.sprite.spritecollide(g.player, g.powerups, dokill=True)
+        for p in got:
+            if p.kind == "rapid":
+                g.player.rapid_timer = 8.0
+            elif p.kind == "shield":
+                g.player.shield_timer = 6.0
+
+
+def new_collisions(g):
+    g.handle_collisions(1/60)
+
+
+# ------------------------------
+# Escenario
+# ------------------------------
+def populate(g, bullets, enemies, seed):
+    """Rellena los grupos del juego; devuelve las listas para identificar supervivientes."""
+    rnd = random.Random(seed)
+    for grp in (g.enemy_group, g.boss_group, g.bullets, g.enemy_bullets, g.powerups):
+        grp.empty()
+    g.score = 0
+    g.state = "playing"
+    g.player.alive = True
+    g.player.lives = 3
+    g.player.shield_timer = 0.0
+    g.player.rapid_timer = 0.0
+    colors = [(255, 120, 120), (160, 230, 140), (150, 210, 255)]
+    es = []
+    cols = 25
+    g.formation = game.Formation()
+    for i in range(enemies):
+        # formación densa (solapada) en la mitad superior
+        x = 10 + (i % cols) * (game.WIDTH - 80) // cols
+        y = 30 + (i // cols) * 14
+        e = game.Enemy((x, y), rnd.choice(colors), frame=i % 2)
+        es.append(e)
+        g.formation.add(e, i % cols)
+        g.enemy_group.add(e)
+    bs = []
+    for _ in range(bullets):
+        b = game.Bullet.acquire(rnd.randint(0, game.WIDTH), rnd.randint(0, game.HEIGHT), -600, (120, 220, 255), 4, 12, 'player')
+        bs.append(b)
+        g.bullets.add(b)
+    px, py = g.player.rect.center
+    for _ in range(60):
+        g.enemy_bullets.spawn(px + rnd.randint(-200, 200), py + rnd.randint(-200, 100), 0, 200, (255, 160, 120))
+    for _ in range(10):
+        g.powerups.add(game.PowerUp.acquire((px + rnd.randint(-150, 150), py + rnd.randint(-150, 0)), kind=rnd.choice(game.PowerUp.TYPES)))
+    return es, bs
+
+
+def outcome(g, es, bs):
+    return (
+        [i for i, e in enumerate(es) if e in g.enemy_group],
+        [i for i, b in enumerate(bs) if b in g.bullets],
+        len(g.enemy_bullets), len(g.powerups),
+        g.score, g.player.lives, g.player.alive, g.state,
+        g.player.rapid_timer, g.player.shield_timer,
+        tuple(rng.getstate() for rng in g.rng.values()),
+    )
+
+
+def run(g, collide, args, warm):
+    """Ejecuta la pasada de colisiones sobre escenarios nuevos; devuelve (mejor tiempo, resultado)."""
+    best = float('inf')
+    result = None
+    for rep in range(args.repeat):
+        es, bs = populate(g, args.bullets, args.enemies, seed=rep)
+        if warm:
+            # frame anterior ya indexado: las rejillas solo actualizan lo que cambia de celda
+            for grid in (g.bullet_grid, g.powerup_grid):
+                grid.sync()
+        else:
+            g.bullet_grid = game.SpatialGrid(g.bullets)
+            g.powerup_grid = game.SpatialGrid(g.powerups)
+        for b in g.bullets:
+            b.move_by(0, -10)
+        g.reseed(rep)
+        t0 = time.perf_counter()
+        collide(g)
+        best = min(best, time.perf_counter() - t0)
+        if rep == 0:
+            result = outcome(g, es, bs)
+    return best, result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--bullets', type=int, default=1000)
+    ap.add_argument('--enemies', type=int, default=500)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args(argv)
+    pygame.init()
+    screen = pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    g = game.Game(screen)
+    g.audio.enabled = False
+    # las explosiones cuestan lo mismo en ambas versiones y taparían la fase de detección
+    g.add_explosion = lambda pos, color: None
+
+    print(f"{args.bullets} balas x {args.enemies} enemigos")
+    print(f"{'versión':<16}{'tiempo (ms)':>14}{'speedup':>10}  idéntico")
+    t_legacy, reference = run(g, legacy_collisions, args, warm=True)
+    print(f"{'groupcollide':<16}{t_legacy*1000:>14.2f}{1.0:>10.1f}  -")
+    for name, warm in (('rejilla (frío)', False), ('rejilla', True)):
+        t, result = run(g, new_collisions, args, warm)
+        same = result == reference
+        print(f"{name:<16}{t*1000:>14.2f}{t_legacy/t:>10.1f}  {'sí' if same else 'NO'}")
+        if not same:
+            raise SystemExit("la rejilla da un resultado distinto a groupcollide")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# bench_particles.py
+# Mide ParticleSystem con muchas partículas vivas: actualización + dibujado por frame.
+#
+#   python -m benchmarks.bench_particles [--particles 10000] [--frames 300]
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import space_bluesky_plus as game
+
+
+def run(particles, frames):
+    ps = game.ParticleSystem()
+    random.seed(1)
+    colors = [(255, 120, 120), (160, 230, 140), (250, 160, 250), (150, 210, 255)]
+    screen = pygame.display.get_surface()
+    dt = 1/60
+    t_update = t_draw = 0.0
+    for _ in range(frames):
+        # mantiene la población: repone lo que muere con explosiones nuevas
+        while len(ps) < particles:
+            ps.emit((random.randint(0, game.WIDTH), random.randint(0, game.HEIGHT)), random.choice(colors), 16)
+        t0 = time.perf_counter()
+        ps.update(dt)
+        t1 = time.perf_counter()
+        ps.draw(screen)
+        t2 = time.perf_counter()
+        t_update += t1 - t0
+        t_draw += t2 - t1
+    return t_update/frames*1000, t_draw/frames*1000
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--particles', type=int, default=10000)
+    ap.add_argument('--frames', type=int, default=300)
+    args = ap.parse_args(argv)
+    pygame.init()
+    pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    numpy_mod = game.np
+    backends = ['numpy', 'listas'] if numpy_mod is not None else ['listas']
+    print(f"{args.particles} partículas, {args.frames} frames (presupuesto a 60 FPS: 16.7 ms)")
+    print(f"{'backend':<10}{'update (ms)':>14}{'draw (ms)':>12}{'total (ms)':>12}")
+    for name in backends:
+        game.np = numpy_mod if name == 'numpy' else None
+        upd, drw = run(args.particles, args.frames)
+        print(f"{name:<10}{upd:>14.2f}{drw:>12.2f}{upd+drw:>12.2f}")
+    game.np = numpy_mod
+
+
+if __name__ == '__main__':
+    main()
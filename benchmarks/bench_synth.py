@@ -0,0 +1,146 @@
+# bench_synth.py
+# Compara la síntesis original (bucles sample a sample) con chipsynth en sus dos backends.
+# Verifica que la salida es idéntica y mide el coste de preparar los SFX + la música de Audio.__init__.
+#
+#   python -m benchmarks.bench_synth [--repeat N]
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import chipsynth
+import space_bluesky_plus as game
+
+SAMPLE_RATE = game.SAMPLE_RATE
+
+
+# ------------------------------
+# Implementación de referencia (la de antes de chipsynth)
+# ------------------------------
+def legacy_square(freq, duration, volume=0.4, sample_rate=SAMPLE_RATE):
+    n = int(duration * sample_rate)
+    if freq <= 0:
+        return [0]*n
+    period = sample_rate / freq
+    samples = []
+    amp = int(32767 * volume)
+    fade = min(120, n//20)
+    for i in range(n):
+        t = (i % period) < (period/2)
+        val = amp if t else -amp
+        if i < fade:
+            val = int(val * (i/fade))
+        if i > n-fade:
+            val = int(val * ((n-i)/fade))
+        samples.append(val)
+    return samples
+
+
+def legacy_noise(duration, volume=0.35, sample_rate=SAMPLE_RATE):
+    n = int(duration * sample_rate)
+    amp = int(32767 * volume)
+    rnd = random.Random(123)
+    samples = []
+    fade = min(120, n//20)
+    for i in range(n):
+        val = rnd.randint(-amp, amp)
+        if i < fade:
+            val = int(val * (i/fade))
+        if i > n-fade:
+            val = int(val * ((n-i)/fade))
+        samples.append(val)
+    return samples
+
+
+def legacy_mix(*tracks):
+    if not tracks:
+        return []
+    L = max(len(t) for t in tracks)
+    out = [0]*L
+    for t in tracks:
+        for i, s in enumerate(t):
+            out[i] += s
+    peak = max(1, max(abs(x) for x in out))
+    if peak > 30000:
+        scale = 30000/peak
+        out = [int(x*scale) for x in out]
+    return out
+
+
+def legacy_melody(bpm=120):
+    beat = 60.0/bpm
+    seq = [
+        ('A4', beat*0.5), ('C5', beat*0.5), ('E5', beat*0.5), ('C5', beat*0.5),
+        ('A4', beat*0.5), ('D5', beat*0.5), ('F5', beat*0.5), ('D5', beat*0.5),
+        ('A4', beat*0.5), ('C5', beat*0.5), ('E5', beat*0.5), ('G5', beat*0.5),
+        ('F5', beat*0.5), ('E5', beat*0.5), ('D5', beat*0.5), ('C5', beat*0.5),
+    ]
+    samples = []
+    for note, dur in seq:
+        samples.extend(legacy_square(game.NOTE_FREQS.get(note, 0), dur, volume=0.22))
+    drums = [0]*(len(samples))
+    step = int(beat*SAMPLE_RATE)
+    kick = legacy_noise(beat*0.15, volume=0.25)
+    for i in range(0, len(drums), step):
+        for j, v in enumerate(kick):
+            if i+j < len(drums):
+                drums[i+j] += v
+    return legacy_mix(samples, drums)
+
+
+def audio_assets(square, noise, mix, melody):
+    """Los mismos buffers que construye Audio.__init__."""
+    return {
+        'shoot': square(880, 0.06, 0.35),
+        'shoot_alt': square(1320, 0.05, 0.30),
+        'explosion': mix(noise(0.22, 0.35), square(110, 0.22, 0.2)),
+        'power': mix(square(1200, 0.08, 0.25), square(1600, 0.06, 0.20)),
+        'hit': square(220, 0.12, 0.30),
+        'boss_roar': mix(square(90, 0.5, 0.22), noise(0.5, 0.12)),
+        'music': melody(bpm=132),
+    }
+
+
+def legacy_assets():
+    return audio_assets(legacy_square, legacy_noise, legacy_mix, legacy_melody)
+
+
+def engine_assets():
+    return audio_assets(game.synth_square, game.synth_noise, game.mix_tracks, game.build_melody)
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    reference = legacy_assets()
+    backends = ['numpy', 'array'] if chipsynth._numpy is not None else ['array']
+    t_legacy = best_of(legacy_assets, max(1, args.repeat//2))
+    print(f"{'backend':<10}{'tiempo (ms)':>14}{'speedup':>10}  idéntico")
+    print(f"{'legacy':<10}{t_legacy*1000:>14.1f}{1.0:>10.1f}  -")
+    for name in backends:
+        chipsynth.set_backend(name)
+        out = engine_assets()
+        same = all(list(out[k]) == reference[k] for k in reference)
+        t = best_of(engine_assets, args.repeat)
+        print(f"{name:<10}{t*1000:>14.1f}{t_legacy/t:>10.1f}  {'sí' if same else 'NO'}")
+        if not same:
+            bad = [k for k in reference if list(out[k]) != reference[k]]
+            raise SystemExit(f"salida distinta en: {', '.join(bad)}")
+
+
+if __name__ == '__main__':
+    main()
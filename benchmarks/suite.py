@@ -0,0 +1,375 @@
+# suite.py
+# Banco de pruebas reproducible de los caminos calientes, tanto de la versión de escritorio
+# (space_bluesky_plus.py) como de la web (main.py): síntesis de la música, creación de oleadas,
+# colisiones, 3000 balas enemigas, Sky.draw, un frame completo y, en la web, reiniciar la
+# partida. Cada escenario fija la semilla del RNG y el número de entidades, y corre con el driver
+# de vídeo dummy.
+#
+# De cada escenario se da la mediana y el p95 del tiempo por operación y el pico de memoria
+# (tracemalloc) de una pasada. Los resultados se pueden guardar en JSON y comparar contra una
+# línea base: si la mediana de algún escenario empeora más que el umbral, sale con código 1.
+#
+#   python -m benchmarks.suite [-k web] [--samples 30] [--json out.json]
+#                              [--baseline benchmarks/baseline.json] [--threshold 0.2]
+#                              [--save-baseline]
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import chipsynth
+import space_bluesky_plus as desktop
+import main as web
+
+from benchmarks.bench_collisions import populate
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SEED = 1234
+FRAMES = 60     # frames por muestra en los escenarios de frame completo
+
+
+class Scenario:
+    """Un camino caliente a medir.
+
+    setup() se llama antes de cada muestra, fuera del cronómetro, y devuelve el estado que
+    recibe run(state). Si run() hace `per` operaciones, los tiempos se dan por operación.
+    """
+    def __init__(self, name, setup, run, per=1, samples=30):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.per = per
+        self.samples = samples
+
+
+class _FixedClock:
+    """Sustituye a pygame.time.Clock: no duerme y siempre informa del mismo dt."""
+    def __init__(self, fps=60):
+        self.ms = 1000.0 / fps
+
+    def tick(self, fps=0):
+        return self.ms
+
+
+def _screen(size):
+    screen = pygame.display.get_surface()
+    if screen is None or screen.get_size() != size:
+        screen = pygame.display.set_mode(size)
+    return screen
+
+
+def _once(factory):
+    """Crea el objeto la primera vez que se pide y lo reutiliza después."""
+    cache = []
+
+    def get():
+        if not cache:
+            cache.append(factory())
+        return cache[0]
+    return get
+
+
+# ------------------------------
+# Escritorio (space_bluesky_plus.py)
+# ------------------------------
+def _desktop_game():
+    g = desktop.Game(_screen((desktop.WIDTH, desktop.HEIGHT)))
+    # el audio se construye en otro hilo; se espera a que termine para que no robe CPU
+    g.audio.ready.wait()
+    g.audio.enabled = False
+    g.clock = _FixedClock(desktop.FPS)
+    return g
+
+
+desktop_game = _once(_desktop_game)
+
+
+def _desktop_spawn():
+    g = desktop_game()
+    g.reseed(SEED)
+    return g
+
+
+def _desktop_collisions():
+    g = desktop_game()
+    populate(g, bullets=400, enemies=250, seed=SEED)
+    for grid in (g.bullet_grid, g.powerup_grid):
+        grid.sync()
+    for b in g.bullets:
+        b.move_by(0, -10)
+    g.reseed(SEED)
+    return g
+
+
+def _desktop_enemy_bullets():
+    g = desktop_game()
+    rnd = random.Random(SEED)
+    field = desktop.BulletField()
+    colors = [(255, 140, 140), (255, 120, 180), (255, 180, 120)]
+    # lentas, para que sigan en pantalla durante toda la muestra
+    for _ in range(3000):
+        field.spawn(rnd.randint(0, desktop.WIDTH), rnd.randint(0, desktop.HEIGHT - 100),
+                    rnd.uniform(-30, 30), rnd.uniform(10, 40), rnd.choice(colors), owner=rnd.choice(field.OWNERS))
+    return g, field
+
+
+def _desktop_enemy_bullets_frame(state):
+    g, field = state
+    field.update(1 / desktop.SIM_HZ)
+    field.collide(g.player.rect)
+    g.screen.blits(field.blit_sequence(alpha=0.5), doreturn=False)
+
+
+def _desktop_sky():
+    g = desktop_game()
+    g.sky.update(1 / desktop.FPS)
+    return g
+
+
+def _desktop_frame():
+    g = desktop_game()
+    g.reseed(SEED)
+    g.reset()
+    g.level = 2
+    g.spawn_wave(g.level)
+    g.accumulator = 0.0
+    return g
+
+
+def _desktop_frames(g):
+    for _ in range(FRAMES):
+        g.frame()
+
+
+# ------------------------------
+# Web (main.py)
+# ------------------------------
+def _web_game():
+    g = web.Game(_screen((web.WIDTH, web.HEIGHT)), seed=SEED)
+    g.audio.enabled = False
+    return g
+
+
+web_game = _once(_web_game)
+
+
+def _web_spawn():
+    g = web_game()
+    g.reseed(SEED)
+    return g
+
+
+def _web_collisions():
+    g = web_game()
+    rnd = random.Random(SEED)
+    g.reseed(SEED)
+    for grp in (g.bullets, g.enemy_bullets, g.powerups, g.particles):
+        grp.empty()
+    g.spawn_wave(4)
+    g.state = 'playing'; g.score = 0
+    g.player.alive = True; g.player.lives = 3; g.player.shield_timer = 0; g.player.rapid_timer = 0
+    for _ in range(400):
+        g.bullets.add(web.Bullet(rnd.randint(0, web.WIDTH), rnd.randint(0, web.HEIGHT), -620, (255, 250, 180)))
+    px, py = g.player.rect.center
+    for _ in range(60):
+        g.enemy_bullets.spawn(px + rnd.randint(-200, 200), py + rnd.randint(-200, 100), 0, 200, (255, 160, 120))
+    for _ in range(10):
+        g.powerups.add(web.PowerUp((px + rnd.randint(-150, 150), py + rnd.randint(-150, 0)), kind=rnd.choice(web.PowerUp.TYPES)))
+    return g
+
+
+def _web_enemy_bullets():
+    g = web_game()
+    rnd = random.Random(SEED)
+    field = web.BulletField()
+    colors = [(255, 140, 140), (255, 120, 180), (255, 180, 120)]
+    # lentas, para que sigan en pantalla durante toda la muestra
+    for _ in range(3000):
+        field.spawn(rnd.randint(0, web.WIDTH), rnd.randint(0, web.HEIGHT - 100),
+                    rnd.uniform(-30, 30), rnd.uniform(10, 40), rnd.choice(colors))
+    return g, field
+
+
+def _web_enemy_bullets_frame(state):
+    g, field = state
+    field.update(1 / 60)
+    field.collide(g.player.rect)
+    field.draw(g.screen)
+
+
+def _web_sky():
+    g = web_game()
+    g.sky.update(1 / 60)
+    return g
+
+
+def _web_frame():
+    g = web.Game(_screen((web.WIDTH, web.HEIGHT)), seed=SEED)
+    g.audio.enabled = False
+    g.level = 2
+    g.spawn_wave(g.level)
+    g.state = 'playing'
+    return g
+
+
+def _web_restart():
+    g = web_game()
+    g.state = 'gameover'
+    return g
+
+
+def _web_frames(g):
+    for _ in range(FRAMES):
+        g.frame(1 / 60)
+
+
+SCENARIOS = [
+    Scenario('desktop.build_melody', lambda: None, lambda _: desktop.build_melody(132), samples=10),
+    Scenario('desktop.spawn_wave', _desktop_spawn, lambda g: g.spawn_wave(5), samples=50),
+    Scenario('desktop.handle_collisions', _desktop_collisions, lambda g: g.handle_collisions(1 / 60)),
+    Scenario('desktop.enemy_bullets', _desktop_enemy_bullets, _desktop_enemy_bullets_frame, samples=50),
+    Scenario('desktop.sky_draw', _desktop_sky, lambda g: g.sky.draw(g.screen), samples=200),
+    Scenario('desktop.frame', _desktop_frame, _desktop_frames, per=FRAMES, samples=10),
+    Scenario('web.build_song', lambda: None, lambda _: web.build_song(), samples=10),
+    Scenario('web.spawn_wave', _web_spawn, lambda g: g.spawn_wave(5), samples=50),
+    Scenario('web.handle_collisions', _web_collisions, lambda g: g.handle_collisions()),
+    Scenario('web.enemy_bullets', _web_enemy_bullets, _web_enemy_bullets_frame, samples=50),
+    Scenario('web.sky_draw', _web_sky, lambda g: g.sky.draw(g.screen), samples=200),
+    Scenario('web.frame', _web_frame, _web_frames, per=FRAMES, samples=10),
+    Scenario('web.restart', _web_restart, lambda g: g.reset(), samples=50),
+]
+
+
+# ------------------------------
+# Medición
+# ------------------------------
+def percentile(values, p):
+    """Percentil por rango más cercano."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(sc, samples=None, warmup=2):
+    n = samples or sc.samples
+    for _ in range(warmup):
+        sc.run(sc.setup())
+    times = []
+    for _ in range(n):
+        state = sc.setup()
+        t0 = time.perf_counter()
+        sc.run(state)
+        times.append((time.perf_counter() - t0) / sc.per * 1000)
+    # el pico de memoria se mide en una pasada aparte: tracemalloc frena mucho el código
+    state = sc.setup()
+    tracemalloc.start()
+    try:
+        sc.run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': statistics.median(times),
+        'p95_ms': percentile(times, 95),
+        'min_ms': min(times),
+        'samples': n,
+        'per': sc.per,
+        'peak_kib': peak / 1024,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': getattr(chipsynth.np, '__version__', None),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Lista de (escenario, ratio, regresión?) frente a la línea base, por mediana."""
+    rows = []
+    for name, r in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = r['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        rows.append((name, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks reproducibles de Space Blue Sky + (escritorio y web)")
+    ap.add_argument('-k', dest='pattern', default='', help="solo los escenarios cuyo nombre contiene este texto")
+    ap.add_argument('--samples', type=int, default=None, help="muestras por escenario (por defecto, las de cada uno)")
+    ap.add_argument('--json', dest='out', default=None, help="guarda los resultados en este fichero")
+    ap.add_argument('--baseline', default=DEFAULT_BASELINE, help="línea base con la que comparar")
+    ap.add_argument('--threshold', type=float, default=0.2,
+                    help="empeoramiento relativo de la mediana que cuenta como regresión (0.2 = 20%%)")
+    ap.add_argument('--save-baseline', action='store_true', help="guarda estos resultados como nueva línea base")
+    ap.add_argument('--list', action='store_true', help="lista los escenarios y sale")
+    args = ap.parse_args(argv)
+
+    selected = [sc for sc in SCENARIOS if args.pattern in sc.name]
+    if args.list:
+        for sc in selected:
+            print(sc.name)
+        return 0
+    pygame.init()
+
+    results = {}
+    print(f"{'escenario':<28}{'mediana (ms)':>14}{'p95 (ms)':>12}{'pico (KiB)':>12}")
+    for sc in selected:
+        r = measure(sc, args.samples)
+        results[sc.name] = r
+        print(f"{sc.name:<28}{r['median_ms']:>14.3f}{r['p95_ms']:>12.3f}{r['peak_kib']:>12.1f}")
+
+    report = {'environment': environment(), 'results': results}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"línea base guardada en {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"sin línea base ({args.baseline}); créala con --save-baseline")
+        return 0
+    env = baseline.get('environment', {})
+    if (env.get('python'), env.get('pygame'), env.get('machine')) != (report['environment']['python'],
+                                                                      report['environment']['pygame'],
+                                                                      report['environment']['machine']):
+        print("aviso: la línea base se tomó en otro entorno, la comparación es orientativa")
+    rows = compare(results, baseline, args.threshold)
+    print(f"\n{'escenario':<28}{'vs base':>10}")
+    for name, ratio, bad in rows:
+        print(f"{name:<28}{ratio:>9.2f}x{'  REGRESIÓN' if bad else ''}")
+    regressions = [name for name, _, bad in rows if bad]
+    if regressions:
+        print(f"{len(regressions)} regresión(es) por encima del {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,374 @@
+# chipsynth.py
+# Motor de síntesis chiptune por bloques: ondas cuadradas, ruido, envolventes y mezcla
+# operando sobre buffers completos en lugar de sample a sample.
+# Usa NumPy si está disponible; si no, recurre a array.array de la biblioteca estándar.
+#
+# Las pistas devueltas son numpy.ndarray (int64) o array.array('i') según el backend.
+# La salida es idéntica bit a bit a las funciones originales de space_bluesky_plus.py
+# y main.py (incluido el ruido con semilla, que reproduce Random.randint exactamente).
+
+import bisect
+import operator
+import random
+import sys
+from array import array
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+_numpy = np
+SAMPLE_RATE = 44100
+
+
+def backend():
+    """Nombre del backend activo: 'numpy' o 'array'."""
+    return 'numpy' if np is not None else 'array'
+
+
+def set_backend(name):
+    """Fuerza el backend ('numpy' o 'array'); útil para benchmarks y comparaciones."""
+    global np
+    if name == 'numpy':
+        if _numpy is None:
+            raise RuntimeError("NumPy no está instalado")
+        np = _numpy
+    elif name == 'array':
+        np = None
+    else:
+        raise ValueError(f"backend desconocido: {name!r}")
+
+
+# ------------------------------
+# Primitivas de buffer
+# ------------------------------
+def zeros(n):
+    if np is not None:
+        return np.zeros(n, dtype=np.int64)
+    return array('i', [0]) * n
+
+
+def _fade(out, n):
+    """Rampa lineal de entrada/salida (120 samples máx.) aplicada en bloque y en sitio."""
+    fade = min(120, n//20)
+    if not fade:
+        return out
+    tail = max(0, n-fade+1)
+    if np is not None:
+        i = np.arange(fade)
+        out[:fade] = np.trunc(out[:fade] * (i/fade))
+        i = np.arange(tail, n)
+        out[tail:] = np.trunc(out[tail:] * ((n-i)/fade))
+    else:
+        out[:fade] = array('i', [int(out[i] * (i/fade)) for i in range(fade)])
+        out[tail:] = array('i', [int(out[i] * ((n-i)/fade)) for i in range(tail, n)])
+    return out
+
+
+def square(freq, duration, volume=0.4, sample_rate=SAMPLE_RATE):
+    """Onda cuadrada con fade corto para evitar clicks."""
+    n = int(duration * sample_rate)
+    if freq <= 0:
+        return zeros(n)
+    period = sample_rate / freq
+    half = period / 2
+    amp = int(32767 * volume)
+    if np is not None:
+        out = np.where(np.mod(np.arange(n, dtype=np.float64), period) < half, amp, -amp).astype(np.int64)
+    else:
+        # Un slice por semiperiodo alto en vez de un sample por iteración. Con P = a/b exacto,
+        # el sample i del periodo k está arriba sii i < k*P + P/2, igual que `i % period < half`.
+        a, b = float(period).as_integer_ratio()
+        out = array('i', [-amp]) * n
+        high = array('i', [amp]) * (int(half) + 2)
+        k = 0
+        while True:
+            start = -((-k*a) // b)
+            if start >= n:
+                break
+            end = min(n, -((-(2*k+1)*a) // (2*b)))
+            out[start:end] = high[:end-start]
+            k += 1
+    return _fade(out, n)
+
+
+def _random_words(getrandbits, count):
+    """`count` salidas consecutivas de 32 bits del generador, en un solo bloque."""
+    raw = getrandbits(32*count).to_bytes(4*count, 'little')
+    if np is not None:
+        return np.frombuffer(raw, dtype='<u4')
+    words = array('I' if array('I').itemsize == 4 else 'L')
+    words.frombytes(raw)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+
+def noise(duration, volume=0.35, seed=None, sample_rate=SAMPLE_RATE):
+    """Ruido blanco uniforme en [-amp, amp].
+
+    Con `seed` usa un random.Random propio; sin ella, el generador global del módulo random.
+    Reproduce exactamente `rnd.randint(-amp, amp)` por sample: se piden palabras de 32 bits
+    en bloque y se aplica el mismo muestreo por rechazo que Random._randbelow.
+    """
+    n = int(duration * sample_rate)
+    amp = int(32767 * volume)
+    if n <= 0 or amp <= 0:
+        return zeros(n)
+    getrandbits = random.Random(seed).getrandbits if seed is not None else random.getrandbits
+    width = 2*amp + 1
+    shift = 32 - width.bit_length()
+    chunks = []
+    got = 0
+    while got < n:
+        need = n - got
+        words = _random_words(getrandbits, need + need//2 + 16)
+        if np is not None:
+            vals = words >> shift
+            vals = vals[vals < width]
+        else:
+            vals = array('i', [v for w in words if (v := w >> shift) < width])
+        chunks.append(vals)
+        got += len(vals)
+    if np is not None:
+        out = np.concatenate(chunks)[:n].astype(np.int64) - amp
+    else:
+        out = array('i')
+        for c in chunks:
+            out.extend(c)
+        del out[n:]
+        out = array('i', [v - amp for v in out])
+    return _fade(out, n)
+
+
+# ------------------------------
+# Mezcla
+# ------------------------------
+def concat(tracks):
+    """Encadena pistas una detrás de otra."""
+    if np is not None:
+        return np.concatenate([np.asarray(t, dtype=np.int64) for t in tracks]) if tracks else zeros(0)
+    out = array('i')
+    for t in tracks:
+        out.extend(t)
+    return out
+
+
+def add(*tracks):
+    """Suma sample a sample truncando a la pista más corta (semántica de zip), sin normalizar."""
+    if not tracks:
+        return zeros(0)
+    L = min(len(t) for t in tracks)
+    if np is not None:
+        out = np.array(tracks[0][:L], dtype=np.int64)
+        for t in tracks[1:]:
+            out += t[:L]
+        return out
+    out = array('i', tracks[0][:L])
+    for t in tracks[1:]:
+        out = array('i', map(operator.add, out, t))
+    return out
+
+
+def pulse_train(length, hit, step):
+    """Pista de `length` samples con `hit` repetido cada `step` samples (p.ej. un bombo por negra)."""
+    out = zeros(length)
+    k = len(hit)
+    for i in range(0, length, step):
+        m = min(k, length - i)
+        if np is not None:
+            out[i:i+m] += hit[:m]
+        else:
+            out[i:i+m] = array('i', map(operator.add, out[i:i+m], hit[:m]))
+    return out
+
+
+def _peak(out):
+    if not len(out):
+        return 1
+    if np is not None:
+        return max(1, int(np.abs(out).max()))
+    return max(1, max(out), -min(out))
+
+
+def mix(*tracks, limit=30000):
+    """Suma pistas alineadas (la más larga manda) y escala solo si el pico supera `limit`."""
+    if not tracks:
+        return zeros(0)
+    L = max(len(t) for t in tracks)
+    out = zeros(L)
+    if np is not None:
+        for t in tracks:
+            out[:len(t)] += t
+    else:
+        for t in tracks:
+            out[:len(t)] = array('i', map(operator.add, out, t))
+    peak = _peak(out)
+    if peak > limit:
+        scale = limit/peak
+        if np is not None:
+            out = np.trunc(out * scale).astype(np.int64)
+        else:
+            out = array('i', map(int, map(scale.__mul__, out)))
+    return out
+
+
+def normalize(track, target=30000):
+    """Reescala siempre la pista para que su pico valga `target`."""
+    peak = _peak(track)
+    if np is not None:
+        return np.trunc(np.asarray(track, dtype=np.int64) * target / peak).astype(np.int64)
+    return array('i', [int(x*target/peak) for x in track])
+
+
+def _add_at(out, offset, src):
+    """out[offset:offset+len(src)] += src, en sitio."""
+    m = len(src)
+    if not m:
+        return
+    if np is not None:
+        out[offset:offset+m] += src
+    else:
+        out[offset:offset+m] = array('i', map(operator.add, out[offset:offset+m], src))
+
+
+# ------------------------------
+# Secuenciador en streaming
+# ------------------------------
+class Sequencer:
+    """Renderiza en ventanas cortas un patrón chiptune en bucle: melodía cuadrada + bombo en cada negra.
+
+    `notes` es una lista de (frecuencia, duración en negras). Cada vuelta del patrón es idéntica,
+    sample a sample, a concatenar las notas con square() y sumar pulse_train() con el bombo, así
+    que el resultado coincide con el render completo sin tener que guardar la canción entera.
+    El tempo se cambia con set_tempo() y entra al empezar la siguiente vuelta; `intensity`
+    escala el volumen desde la siguiente ventana.
+    """
+
+    def __init__(self, notes, bpm=120, lead_volume=0.22, kick_volume=0.25, kick_seed=123,
+                 sample_rate=SAMPLE_RATE):
+        self.notes = list(notes)
+        self.lead_volume = lead_volume
+        self.kick_volume = kick_volume
+        self.kick_seed = kick_seed
+        self.sample_rate = sample_rate
+        self.intensity = 1.0
+        self.bpm = bpm
+        self._next_bpm = bpm
+        self._start_loop()
+
+    def set_tempo(self, bpm):
+        self._next_bpm = bpm
+
+    def _start_loop(self):
+        self.bpm = self._next_bpm
+        beat = 60.0/self.bpm
+        sr = self.sample_rate
+        self._starts = []
+        pos = 0
+        for freq, beats in self.notes:
+            self._starts.append(pos)
+            pos += int(beat*beats * sr)
+        self.loop_length = pos
+        self._step = int(beat*sr)
+        self._kick = noise(beat*0.15, self.kick_volume, seed=self.kick_seed, sample_rate=sr)
+        self._note_tracks = {}   # solo las notas del tempo actual: memoria acotada
+        self.pos = 0
+
+    def _note(self, i):
+        track = self._note_tracks.get(i)
+        if track is None:
+            freq, beats = self.notes[i]
+            track = square(freq, (60.0/self.bpm)*beats, self.lead_volume, self.sample_rate)
+            self._note_tracks[i] = track
+        return track
+
+    def _render_window(self, out, at, a, b):
+        # melodía: notas que solapan [a, b)
+        i = max(0, bisect.bisect_right(self._starts, a) - 1)
+        while i < len(self._starts) and self._starts[i] < b:
+            start = self._starts[i]
+            note = self._note(i)
+            lo, hi = max(a, start), min(b, start + len(note))
+            if lo < hi:
+                _add_at(out, at + lo - a, note[lo-start:hi-start])
+            i += 1
+        # bombo en cada negra, recortado al final de la vuelta como en pulse_train()
+        k = len(self._kick)
+        h = max(0, (a - k) // self._step + 1) * self._step if a >= k else 0
+        while h < b:
+            lo, hi = max(a, h), min(b, h + k, self.loop_length)
+            if lo < hi:
+                _add_at(out, at + lo - a, self._kick[lo-h:hi-h])
+            h += self._step
+
+    def render(self, n):
+        """Siguientes `n` samples de la canción."""
+        out = zeros(n)
+        filled = 0
+        while filled < n:
+            if self.pos >= self.loop_length:
+                self._start_loop()
+                if not self.loop_length:
+                    break
+            m = min(n - filled, self.loop_length - self.pos)
+            self._render_window(out, filled, self.pos, self.pos + m)
+            self.pos += m
+            filled += m
+        if self.intensity != 1.0:
+            if np is not None:
+                out = np.trunc(out * self.intensity).astype(np.int64)
+            else:
+                out = array('i', map(int, map(self.intensity.__mul__, out)))
+        return out
+
+
+# ------------------------------
+# Buffers PCM
+# ------------------------------
+def to_pcm16(track):
+    """Recorta en bloque a int16 y devuelve un buffer PCM (numpy int16 o array('h')) en orden nativo."""
+    if np is not None:
+        track = np.asarray(track)
+        if track.dtype == np.int16:
+            return track
+        return np.clip(track, -32768, 32767).astype(np.int16)
+    if isinstance(track, array) and track.typecode == 'h':
+        return track
+    n = len(track)
+    return array('h', map(max, repeat(-32768, n), map(min, repeat(32767, n), track)))
+
+
+def interleave(pcm, channels):
+    """Duplica un buffer mono en `channels` canales entrelazados (L R L R ...)."""
+    if channels == 1:
+        return pcm
+    if np is not None:
+        return np.repeat(pcm, channels)
+    out = array('h', [0]) * (len(pcm) * channels)
+    for c in range(channels):
+        out[c::channels] = pcm
+    return out
+
+
+def pcm_bytes_le(pcm):
+    """Bytes little-endian del buffer PCM, el orden que exige un WAV."""
+    if np is not None:
+        return np.asarray(pcm, dtype='<i2').tobytes()
+    if sys.byteorder == 'big':
+        pcm = array('h', pcm)
+        pcm.byteswap()
+    return pcm.tobytes()
+
+
+def pcm_from_bytes_le(data):
+    """Inverso de pcm_bytes_le: bytes little-endian a buffer PCM int16 nativo."""
+    if np is not None:
+        return np.frombuffer(data, dtype='<i2').astype(np.int16)
+    pcm = array('h')
+    pcm.frombytes(data)
+    if sys.byteorder == 'big':
+        pcm.byteswap()
+    return pcm
@@ -0,0 +1,176 @@
+# headless.py
+# Simulación sin ventana, sin audio y sin teclado: el juego avanza con Game.step() tan rápido
+# como dé la CPU y la entrada la pone un controlador (por defecto, un piloto automático).
+# Sirve de base para pruebas de carga de la lógica del juego.
+#
+#   python headless.py [--minutes 5] [--sim-hz 120] [--seed 1] [--record partida.bin]
+#   python headless.py --replay partida.bin
+#
+# Un controlador es cualquier invocable controller(game) -> Actions, consultado en cada tick.
+# Las partidas grabadas (aquí o en el juego con --record) se reproducen igual con o sin ventana.
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from space_bluesky_plus import Actions, Game, InputRecorder, InputReplay, SIM_HZ, WIDTH
+
+
+class Autopilot:
+    """Piloto sencillo: se coloca bajo el enemigo más cercano (o el jefe), dispara cuando está
+    alineado y se aparta de las balas enemigas que le caen encima.
+
+    Con `skill` < 1 reacciona tarde: en cada tick, con probabilidad 1 - skill, repite lo que
+    hizo en el anterior en vez de decidir de nuevo (con su propio RNG, semilla `seed`)."""
+    def __init__(self, aim_tolerance=12, danger_height=160, danger_width=36, skill=1.0, seed=0):
+        self.aim_tolerance = aim_tolerance
+        self.danger_height = danger_height
+        self.danger_width = danger_width
+        self.skill = skill
+        self.rng = random.Random(seed)
+        self.last = Actions()
+
+    def target_x(self, game):
+        boss = game.boss_group.sprite
+        if boss:
+            return boss.rect.centerx
+        px = game.player.rect.centerx
+        best = None
+        # el más bajo de cada columna es el que se puede alcanzar
+        for members in game.formation.columns.values():
+            x = members[-1].rect.centerx
+            if best is None or abs(x - px) < abs(best - px):
+                best = x
+        return best
+
+    def threat(self, game):
+        """Desplazamiento horizontal de la bala enemiga más cercana que amenaza al jugador (o None)."""
+        pr = game.player.rect
+        worst = None
+        for r in game.enemy_bullets.rects():
+            if r.top > pr.bottom or r.bottom < pr.top - self.danger_height:
+                continue
+            dx = r.centerx - pr.centerx
+            if abs(dx) < self.danger_width + pr.width // 2 and (worst is None or r.bottom > worst[0]):
+                worst = (r.bottom, dx)
+        return None if worst is None else worst[1]
+
+    def __call__(self, game):
+        if self.skill < 1.0 and self.rng.random() >= self.skill:
+            # un tick sin reaccionar; el disparo es una pulsación y no se repite
+            return self.last._replace(shoot=False)
+        self.last = self.decide(game)
+        return self.last
+
+    def decide(self, game):
+        px = game.player.rect.centerx
+        dodge = self.threat(game)
+        if dodge is not None:
+            # huye hacia el lado contrario a la bala, salvo que esté pegado a la pared
+            go_left = dodge > 0 if 60 < px < WIDTH - 60 else px > WIDTH // 2
+            return Actions(left=go_left, right=not go_left)
+        target = self.target_x(game)
+        if target is None:
+            return Actions()
+        dx = target - px
+        aligned = abs(dx) <= self.aim_tolerance
+        return Actions(left=dx < -self.aim_tolerance, right=dx > self.aim_tolerance,
+                       fire=aligned, shoot=aligned)
+
+
+def run(minutes, sim_hz=SIM_HZ, seed=1, controller=None, restart=True, record=None):
+    """Simula `minutes` minutos de juego; devuelve un dict con el resumen.
+    Con `record` (ruta) se graba la entrada de cada tick (ver InputRecorder)."""
+    pygame.init()
+    controller = controller or Autopilot()
+    game = Game(None, sim_hz=sim_hz, seed=seed)
+    if record:
+        game.recorder = InputRecorder(seed, sim_hz)
+    total_ticks = round(minutes * 60 * sim_hz)
+    dt = game.tick_dt
+    games = 0
+    scores = []
+    max_level = game.level
+    t0 = time.perf_counter()
+    for _ in range(total_ticks):
+        actions = controller(game)
+        # se empieza (y se reinicia) como desde el teclado, para que la grabación lo recoja
+        if game.state != "playing":
+            if game.state == "gameover":
+                scores.append(game.score)
+                if not restart:
+                    break
+            actions = actions._replace(restart=True)
+            games += 1
+        game.step(dt, actions)
+        max_level = max(max_level, game.level)
+    wall = time.perf_counter() - t0
+    if record:
+        game.recorder.save(record)
+    simulated = game.ticks * dt
+    if game.state != "gameover":
+        scores.append(game.score)
+    return {
+        'simulated_s': simulated,
+        'wall_s': wall,
+        'speed': simulated / wall if wall else float('inf'),
+        'ticks_per_s': game.ticks / wall if wall else float('inf'),
+        'games': games,
+        'max_level': max_level,
+        'best_score': max(scores),
+        'allocations': game.allocation_stats(),
+    }
+
+
+def replay(path):
+    """Reproduce una grabación sin ventana; devuelve un dict con el estado final."""
+    pygame.init()
+    rp = InputReplay(path)
+    game = Game(None, sim_hz=rp.sim_hz, seed=rp.seed)
+    game.replay = rp
+    max_level = game.level
+    t0 = time.perf_counter()
+    while not rp.done:
+        game.step(game.tick_dt, Actions())
+        max_level = max(max_level, game.level)
+    wall = time.perf_counter() - t0
+    return {
+        'ticks': game.ticks,
+        'simulated_s': game.ticks * game.tick_dt,
+        'wall_s': wall,
+        'state': game.state,
+        'score': game.score,
+        'level': game.level,
+        'max_level': max_level,
+        'lives': game.player.lives,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulación headless de Space Blue Sky + con piloto automático")
+    ap.add_argument('--minutes', type=float, default=5.0, help="minutos de juego simulados")
+    ap.add_argument('--sim-hz', type=int, default=SIM_HZ)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--record', metavar='FICHERO', help="graba la partida para reproducirla después")
+    ap.add_argument('--replay', metavar='FICHERO', help="reproduce una grabación en vez de usar el piloto")
+    args = ap.parse_args(argv)
+    if args.replay:
+        r = replay(args.replay)
+        print(f"reproducido: {r['simulated_s']:.1f} s ({r['ticks']} ticks) en {r['wall_s']:.2f} s reales")
+        print(f"final: {r['state']}  puntuación: {r['score']}  oleada: {r['level']}  vidas: {r['lives']}")
+        return
+    r = run(args.minutes, sim_hz=args.sim_hz, seed=args.seed, record=args.record)
+    print(f"simulado: {r['simulated_s']:.1f} s en {r['wall_s']:.2f} s reales "
+          f"-> {r['speed']:.1f} s simulados/s ({r['ticks_per_s']:.0f} ticks/s)")
+    print(f"partidas: {r['games']}  oleada máxima: {r['max_level']}  mejor puntuación: {r['best_score']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,86 +1,67 @@
 # main.py (web)
-import asyncio, math, random, sys
+import asyncio, math, random, sys, time
 import pygame
 
 WIDTH, HEIGHT = 960, 540
 WHITE=(255,255,255); SKY_TOP=(110,175,255); SKY_BOTTOM=(200,230,255); HUD_COLOR=(240,250,255)
 
-import io, wave, struct
+import io, wave
+import assets, chipsynth, soundcache
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np=None
 SAMPLE_RATE=44100
 
 def _to_wav_bytes(samples, sr=SAMPLE_RATE):
     buf=io.BytesIO();
     with wave.open(buf,'wb') as wf:
         wf.setnchannels(1); wf.setsampwidth(2); wf.setframerate(sr)
-        wf.writeframes(b''.join(struct.pack('<h', max(-32768,min(32767,int(s)))) for s in samples))
+        wf.writeframes(chipsynth.pcm_bytes_le(chipsynth.to_pcm16(samples)))
     buf.seek(0); return buf
 
 NOTE={'A4':440.0,'C5':523.25,'D5':587.33,'E5':659.25,'F5':698.46,'G5':783.99,'A5':880.00}
 
 def sq(freq,dur,vol=0.35):
-    n=int(dur*SAMPLE_RATE)
-    if freq<=0: return [0]*n
-    period=SAMPLE_RATE/freq; amp=int(32767*vol); fade=min(120,n//20)
-    out=[]
-    for i in range(n):
-        v=amp if (i%period)<(period/2) else -amp
-        if i<fade: v=int(v*(i/fade))
-        if i>n-fade: v=int(v*((n-i)/fade))
-        out.append(v)
-    return out
-
-def noise(dur,vol=0.28):
-    import random
-    n=int(dur*SAMPLE_RATE); amp=int(32767*vol); fade=min(120,n//20)
-    out=[]
-    for i in range(n):
-        v=random.randint(-amp,amp)
-        if i<fade: v=int(v*(i/fade))
-        if i>n-fade: v=int(v*((n-i)/fade))
-        out.append(v)
-    return out
-
-def build_song():
-    beat=60/132
-    seq=[('A4',.5),('C5',.5),('E5',.5),('C5',.5),('A4',.5),('D5',.5),('F5',.5),('D5',.5)]*2
-    melody=[]
-    for n,d in seq: melody+=sq(NOTE[n],d,0.22)
-    drums=[0]*len(melody); step=int(beat*SAMPLE_RATE); k=noise(beat*0.15,0.22)
-    for i in range(0,len(drums),step):
-        for j,v in enumerate(k):
-            if i+j<len(drums): drums[i+j]+=v
-    peak=max(1,max(abs(x+y) for x,y in zip(melody,drums)))
-    mix=[int((x+y)*30000/peak) for x,y in zip(melody,drums)]
-    return _to_wav_bytes(mix)
+    return chipsynth.square(freq,dur,vol,SAMPLE_RATE)
+
+def noise(dur,vol=0.28,seed=None):
+    return chipsynth.noise(dur,vol,seed=seed,sample_rate=SAMPLE_RATE)
+
+SONG=(('A4',.5),('C5',.5),('E5',.5),('C5',.5),('A4',.5),('D5',.5),('F5',.5),('D5',.5))*2
+
+def build_song(seq=SONG,bpm=132):
+    beat=60/bpm
+    melody=chipsynth.concat([sq(NOTE[n],d,0.22) for n,d in seq])
+    drums=chipsynth.pulse_train(len(melody),noise(beat*0.15,0.22,seed=11),int(beat*SAMPLE_RATE))
+    return chipsynth.normalize(chipsynth.add(melody,drums),30000)
+# la secuencia y el tempo entran en la clave de la caché; si cambia el cuerpo o NOTE, subir esto
+build_song.cache_version=1
 
 class Audio:
+    # Orden de carga: SFX cortos primero, música al final. En la web no hay hilos, así que
+    # pump() construye un asset por frame y hasta entonces s()/play_music() no hacen nada.
+    RECIPES=[('s_shoot',(sq,880,0.06,0.35)),('s_shoot2',(sq,1320,0.05,0.30)),
+             ('s_power',(chipsynth.add,(sq,1200,0.08,0.25),(sq,1600,0.06,0.20))),('s_hit',(sq,220,0.12,0.30)),
+             ('s_expl',(chipsynth.add,(noise,0.22,0.28,1),(sq,110,0.22,0.2))),
+             ('s_roar',(chipsynth.add,(sq,90,0.5,0.22),(noise,0.5,0.12,2))),('music',(build_song,))]
     def __init__(self):
-        self.enabled=False
+        self.enabled=False; self.music_ch=None; self.ready_times={}; self.t0=pygame.time.get_ticks()
+        for attr,_ in Audio.RECIPES: setattr(self,attr,None)
         try:
             if not pygame.mixer.get_init():
                 pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=1, buffer=512)
             self.enabled=True
         except Exception:
             self.enabled=False; return
-        try:
-            self.s_shoot=pygame.mixer.Sound(file=_to_wav_bytes(sq(880,0.06,0.35)))
-            self.s_shoot2=pygame.mixer.Sound(file=_to_wav_bytes(sq(1320,0.05,0.30)))
-            self.s_expl=pygame.mixer.Sound(file=_to_wav_bytes([x+y for x,y in zip(noise(0.22),sq(110,0.22,0.2))]))
-            self.s_power=pygame.mixer.Sound(file=_to_wav_bytes([x+y for x,y in zip(sq(1200,0.08,0.25),sq(1600,0.06,0.20))]))
-            self.s_hit=pygame.mixer.Sound(file=_to_wav_bytes(sq(220,0.12,0.30)))
-            self.s_roar=pygame.mixer.Sound(file=_to_wav_bytes([x+y for x,y in zip(sq(90,0.5,0.22),noise(0.5,0.12))]))
-            self.music=pygame.mixer.Sound(file=build_song())
-        except TypeError:
-            self.s_shoot=pygame.mixer.Sound(_to_wav_bytes(sq(880,0.06,0.35)))
-            self.s_shoot2=pygame.mixer.Sound(_to_wav_bytes(sq(1320,0.05,0.30)))
-            self.s_expl=pygame.mixer.Sound(_to_wav_bytes([x+y for x,y in zip(noise(0.22),sq(110,0.22,0.2))]))
-            self.s_power=pygame.mixer.Sound(_to_wav_bytes([x+y for x,y in zip(sq(1200,0.08,0.25),sq(1600,0.06,0.20))]))
-            self.s_hit=pygame.mixer.Sound(_to_wav_bytes(sq(220,0.12,0.30)))
-            self.s_roar=pygame.mixer.Sound(_to_wav_bytes([x+y for x,y in zip(sq(90,0.5,0.22),noise(0.5,0.12))]))
-            self.music=pygame.mixer.Sound(build_song())
-        self.music_ch=None
+        self.pending=[attr for attr,_ in Audio.RECIPES]
+    def pump(self):
+        if not self.enabled or not self.pending: return
+        attr=self.pending.pop(0)
+        setattr(self,attr,ASSETS.get(attr))
+        self.ready_times[attr]=(pygame.time.get_ticks()-self.t0)/1000.0
     def play_music(self):
-        if self.enabled and (not self.music_ch or not self.music_ch.get_busy()):
+        if self.enabled and self.music and (not self.music_ch or not self.music_ch.get_busy()):
             self.music_ch=self.music.play(loops=-1)
     def pause_all(self):
         try: pygame.mixer.pause()
@@ -94,6 +75,15 @@ class Audio:
         s=mp.get(k)
         if s: s.play()
 
+_sound_cache=None
+
+def make_sound(recipe):
+    global _sound_cache
+    if _sound_cache is None: _sound_cache=soundcache.SoundCache()
+    pcm=chipsynth.to_pcm16(_sound_cache.fetch(recipe)); freq,size,ch=pygame.mixer.get_init()
+    if freq==SAMPLE_RATE and size==-16: return pygame.mixer.Sound(buffer=chipsynth.interleave(pcm,ch))
+    return pygame.mixer.Sound(file=_to_wav_bytes(pcm))
+
 # Arte utilitario
 
 def draw_vertical_gradient(surf, top, bottom):
@@ -151,17 +141,117 @@ def make_boss_surface(frame=0):
         pygame.draw.polygon(s,(240,140,240),[(x,h-10),(x+18,h-28),(x+36,h-10)])
     return s
 
+def make_bullet_surface(color):
+    s=pygame.Surface((4,12),pygame.SRCALPHA)
+    pygame.draw.rect(s,color,(0,0,4,12),border_radius=2)
+    return s
+
+def make_powerup_surface(kind):
+    s=pygame.Surface((22,22),pygame.SRCALPHA)
+    pygame.draw.circle(s,PowerUp.COLORS[kind],(11,11),11)
+    pygame.draw.circle(s,(255,255,255),(11,11),10,2)
+    t=ASSETS.get('powerup_font').render('R' if kind=='rapid' else 'S',True,(20,40,60)); s.blit(t,t.get_rect(center=(11,11)))
+    return s
+
+def make_sky_surface():
+    s=pygame.Surface((WIDTH,HEIGHT)); draw_vertical_gradient(s,SKY_TOP,SKY_BOTTOM)
+    return s
+
+# Recursos: se crean al pedirlos por primera vez y se comparten (ver assets.py). 'boot' es lo que
+# se precalienta en la pantalla de carga; los sonidos los va construyendo Audio.pump() de uno en uno.
+ENEMY_PALETTE=[(255,120,120),(255,180,120),(255,230,120),(160,230,140),(150,200,255),(210,160,255)]
+BULLET_COLORS=[(255,250,180),(255,140,140),(255,120,180),(255,180,120)]
+ASSETS=assets.Assets()
+ASSETS.font('font','arial',22); ASSETS.font('bigfont','arial',40,bold=True); ASSETS.font('powerup_font','arial',14,bold=True)
+ASSETS.register('player',make_player_surface); ASSETS.register('enemy',make_enemy_surface); ASSETS.register('boss',make_boss_surface)
+ASSETS.register('bullet',make_bullet_surface); ASSETS.register('powerup',make_powerup_surface); ASSETS.register('sky',make_sky_surface)
+ASSETS.image('logo','assets/icon.png',size=(140,140))
+for _attr,_recipe in Audio.RECIPES: ASSETS.register(_attr,lambda r=_recipe: make_sound(r),kind='sound')
+ASSETS.define_set('boot',['font','bigfont','powerup_font','player','sky','logo']+[('enemy',c,f) for c in ENEMY_PALETTE for f in (0,1)]
+                  +[('boss',f) for f in (0,1)]+[('bullet',c) for c in BULLET_COLORS]+[('powerup',k) for k in ('rapid','shield')])
+ASSETS.define_set('sounds',[attr for attr,_ in Audio.RECIPES])
+
 class Bullet(pygame.sprite.Sprite):
     def __init__(self,x,y,dy,color,owner='player'):
         super().__init__()
-        self.image=pygame.Surface((4,12),pygame.SRCALPHA)
-        pygame.draw.rect(self.image,color,(0,0,4,12),border_radius=2)
+        self.image=ASSETS.get('bullet',color)
         self.rect=self.image.get_rect(center=(x,y))
         self.dy=dy; self.owner=owner
     def update(self,dt):
         self.rect.y+=int(self.dy*dt)
         if self.rect.bottom<0 or self.rect.top>HEIGHT: self.kill()
 
+class BulletField:
+    # Balas enemigas (oleadas y jefe) en arrays: x, y (esquina superior izquierda), vx, vy y id de
+    # color. Se mueven, se descartan al salir de pantalla y chocan con el jugador de una pasada
+    # para todas, y se dibujan con un solo blits() de las imágenes compartidas de cada color.
+    # Como los sprites de antes, avanzan int(v*dt) píxeles por frame. Usa NumPy si está
+    # disponible; si no, listas de Python.
+    W,H=4,12
+    def __init__(self,capacity=256):
+        self.color_ids={}; self.images=[]; self.count=0
+        if np is not None: self.data=np.zeros((4,capacity)); self.cid=np.zeros(capacity,dtype=np.int32)
+        else: self.data=[[] for _ in range(4)]; self.cid=[]
+    def __len__(self): return self.count
+    def spawn(self,x,y,vx,vy,color):
+        """Bala centrada en (x,y)."""
+        c=self.color_ids.get(color)
+        if c is None: c=self.color_ids[color]=len(self.images); self.images.append(ASSETS.get('bullet',color))
+        x=int(x)-self.W//2; y=int(y)-self.H//2; n=self.count
+        if np is not None:
+            if n==self.cid.size:
+                data=np.zeros((4,2*n)); data[:,:n]=self.data; cid=np.zeros(2*n,dtype=np.int32); cid[:n]=self.cid
+                self.data,self.cid=data,cid
+            self.data[:,n]=(x,y,vx,vy); self.cid[n]=c
+        else:
+            for col,v in zip(self.data,(x,y,vx,vy)): col.append(v)
+            self.cid.append(c)
+        self.count=n+1
+    def _keep(self,keep):
+        if np is not None:
+            m=int(keep.sum()); self.data[:,:m]=self.data[:,:self.count][:,keep]; self.cid[:m]=self.cid[:self.count][keep]; self.count=m
+        else:
+            self.data=[[v for v,k in zip(col,keep) if k] for col in self.data]; self.cid=[c for c,k in zip(self.cid,keep) if k]; self.count=len(self.cid)
+    def update(self,dt):
+        n=self.count
+        if not n: return
+        if np is not None:
+            x,y,vx,vy=self.data[:,:n]
+            x+=np.trunc(vx*dt); y+=np.trunc(vy*dt)
+            keep=(y+self.H>=0)&(y<=HEIGHT)&(x+self.W>=0)&(x<=WIDTH)
+            if not keep.all(): self._keep(keep)
+        else:
+            x,y,vx,vy=self.data
+            for i in range(n): x[i]+=int(vx[i]*dt); y[i]+=int(vy[i]*dt)
+            keep=[yy+self.H>=0 and yy<=HEIGHT and xx+self.W>=0 and xx<=WIDTH for xx,yy in zip(x,y)]
+            if not all(keep): self._keep(keep)
+    def collide(self,rect):
+        """Quita las balas que tocan `rect` (como Rect.colliderect) y devuelve cuántas eran."""
+        n=self.count
+        if not n: return 0
+        if np is not None:
+            x,y=self.data[:2,:n]
+            hit=(x<rect.right)&(x+self.W>rect.left)&(y<rect.bottom)&(y+self.H>rect.top)
+            hits=int(hit.sum())
+            if hits: self._keep(~hit)
+        else:
+            keep=[not (xx<rect.right and xx+self.W>rect.left and yy<rect.bottom and yy+self.H>rect.top) for xx,yy in zip(*self.data[:2])]
+            hits=n-sum(keep)
+            if hits: self._keep(keep)
+        return hits
+    def draw(self,surf,ox=0,oy=0):
+        n=self.count
+        if not n: return
+        if np is not None:
+            xs=(self.data[0,:n]+ox).astype(np.int32).tolist(); ys=(self.data[1,:n]+oy).astype(np.int32).tolist(); cids=self.cid[:n].tolist()
+        else:
+            xs=[int(v)+ox for v in self.data[0]]; ys=[int(v)+oy for v in self.data[1]]; cids=self.cid
+        images=self.images
+        surf.blits([(images[c],(px,py)) for c,px,py in zip(cids,xs,ys)],doreturn=False)
+    def empty(self):
+        self.count=0
+        if np is None: self.data=[[] for _ in range(4)]; self.cid=[]
+
 class Particle(pygame.sprite.Sprite):
     def __init__(self,pos,color,vel,lifetime=0.6):
         super().__init__()
@@ -177,16 +267,10 @@ class Particle(pygame.sprite.Sprite):
 class PowerUp(pygame.sprite.Sprite):
     TYPES=("rapid","shield")
     COLORS={"rapid":(120,255,160),"shield":(160,220,255)}
-    def __init__(self,pos,kind=None):
+    def __init__(self,pos,kind):
         super().__init__()
-        self.kind=kind or random.choice(PowerUp.TYPES)
-        self.image=pygame.Surface((22,22),pygame.SRCALPHA)
-        color=PowerUp.COLORS[self.kind]
-        pygame.draw.circle(self.image,color,(11,11),11)
-        pygame.draw.circle(self.image,(255,255,255),(11,11),10,2)
-        font=pygame.font.SysFont('arial',14,True)
-        icon='R' if self.kind=='rapid' else 'S'
-        t=font.render(icon,True,(20,40,60)); self.image.blit(t,t.get_rect(center=(11,11)))
+        self.kind=kind
+        self.image=ASSETS.get('powerup',self.kind)
         self.rect=self.image.get_rect(center=pos); self.vy=120
     def update(self,dt):
         self.rect.y+=int(self.vy*dt)
@@ -195,7 +279,7 @@ class PowerUp(pygame.sprite.Sprite):
 class Player(pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
-        self.image=make_player_surface(); self.rect=self.image.get_rect(midbottom=(WIDTH//2,HEIGHT-30))
+        self.image=ASSETS.get('player'); self.rect=self.image.get_rect(midbottom=(WIDTH//2,HEIGHT-30))
         self.speed=360; self.cooldown=0.35; self.cool_timer=0
         self.alive=True; self.lives=3
         self.rapid_timer=0; self.shield_timer=0; self.shield_radius=40
@@ -227,12 +311,12 @@ class Player(pygame.sprite.Sprite):
 class Enemy(pygame.sprite.Sprite):
     def __init__(self,pos,color,frame=0):
         super().__init__(); self.frame=frame; self.color=color
-        self.image=make_enemy_surface(color,frame); self.rect=self.image.get_rect(topleft=pos)
-    def animate(self,frame): self.frame=frame; self.image=make_enemy_surface(self.color,frame)
+        self.image=ASSETS.get('enemy',color,frame%2); self.rect=self.image.get_rect(topleft=pos)
+    def animate(self,frame): self.frame=frame; self.image=ASSETS.get('enemy',self.color,frame%2)
 
 class Boss(pygame.sprite.Sprite):
     def __init__(self,pos,level):
-        super().__init__(); self.frame=0; self.image=make_boss_surface(0); self.rect=self.image.get_rect(center=pos)
+        super().__init__(); self.frame=0; self.image=ASSETS.get('boss',0); self.rect=self.image.get_rect(center=pos)
         self.max_hp=150+60*(max(1,level//3)-1); self.hp=self.max_hp
         self.speed_x=120+10*(max(1,level//3)-1); self.dir=1
         self.fire_timer=0; self.fire_cool=max(0.7,1.2-0.05*(max(1,level//3)-1))
@@ -243,13 +327,13 @@ class Boss(pygame.sprite.Sprite):
         elif self.rect.left<=10: self.dir=1; self.rect.left=10
         self.anim_timer+=dt
         if self.anim_timer>=0.3:
-            self.anim_timer=0; self.frame=1-self.frame; self.image=make_boss_surface(self.frame)
+            self.anim_timer=0; self.frame=1-self.frame; self.image=ASSETS.get('boss',self.frame)
         self.phase_timer+=dt
         if self.phase_timer>=6: self.phase=2 if self.phase==1 else 1; self.phase_timer=0
 
 class Sky:
     def __init__(self):
-        self.bg=pygame.Surface((WIDTH,HEIGHT)); draw_vertical_gradient(self.bg,SKY_TOP,SKY_BOTTOM)
+        self.bg=ASSETS.get('sky')
         self.layers=[]; rnd=random.Random(42)
         for speed,opacity,srng,count in [(20,140,(180,260),4),(35,170,(160,220),5),(60,200,(120,180),6)]:
             clouds=[]
@@ -258,21 +342,21 @@ class Sky:
                 s=pygame.Surface((w,h),pygame.SRCALPHA)
                 base=pygame.Surface((w,h),pygame.SRCALPHA)
                 for __ in range(6):
-                    import random as rr
-                    rw=rr.randint(int(w*.35),int(w*.65)); rh=rr.randint(int(h*.40),int(h*.70))
-                    rx=rr.randint(0,w-rw); ry=rr.randint(0,h-rh)
+                    rw=rnd.randint(int(w*.35),int(w*.65)); rh=rnd.randint(int(h*.40),int(h*.70))
+                    rx=rnd.randint(0,w-rw); ry=rnd.randint(0,h-rh)
                     pygame.draw.ellipse(base,(255,255,255,opacity),(rx,ry,rw,rh))
                 s.blit(base,(0,0))
                 x=rnd.randint(0,WIDTH); y=rnd.randint(20,HEIGHT//2)
                 clouds.append({'surf':s,'x':x,'y':y})
             self.layers.append({'speed':speed,'clouds':clouds})
+        self.rng=rnd  # el cielo va por frame: con su propio RNG no altera el de la partida
     def update(self,dt):
         for layer in self.layers:
             sp=layer['speed']
             for c in layer['clouds']:
                 c['x']-=sp*dt
                 if c['x']+c['surf'].get_width()<0:
-                    c['x']=WIDTH+random.randint(20,200); c['y']=random.randint(20,HEIGHT//2)
+                    c['x']=WIDTH+self.rng.randint(20,200); c['y']=self.rng.randint(20,HEIGHT//2)
     def draw(self,surf):
         surf.blit(self.bg,(0,0))
         for layer in self.layers:
@@ -280,22 +364,40 @@ class Sky:
                 surf.blit(c['surf'],(int(c['x']),int(c['y'])))
 
 class Game:
-    def __init__(self,screen):
-        self.screen=screen; self.clock=pygame.time.Clock()
-        self.font=pygame.font.SysFont('arial',22); self.bigfont=pygame.font.SysFont('arial',40,True)
-        self.sky=Sky(); self.player=Player();
-        self.player_group=pygame.sprite.GroupSingle(self.player)
+    # Un RNG por subsistema, como en la versión de escritorio: oleadas, disparo enemigo, power-ups,
+    # explosiones y temblor de pantalla (por frame; no influye en la partida)
+    RNG_STREAMS=('waves','fire','drops','fx','shake')
+
+    def __init__(self,screen,pacer=None,seed=None):
+        # Lo que dura toda la sesión: pantalla, audio, cielo, fuentes e imágenes. Reiniciar la
+        # partida no lo toca (ver reset()), así que volver a jugar no sintetiza ni dibuja nada.
+        self.boot=pygame.time.get_ticks(); self.time_to_first_frame=None
+        self.screen=screen; self.clock=pygame.time.Clock(); self.pacer=pacer
+        self.font=ASSETS.get('font'); self.bigfont=ASSETS.get('bigfont')
+        self.sky=Sky()
+        # misma semilla = misma partida; reset() no vuelve a sembrar, las partidas siguientes continúan los RNG
+        self.rng={name:random.Random() for name in self.RNG_STREAMS}
+        self.reseed(random.randrange(2**32) if seed is None else seed)
+        self.audio=Audio(); self.brand='JPortas Desing Vintage'
+        self.logo=ASSETS.get('logo')
+        self.player_group=pygame.sprite.GroupSingle()
         self.enemy_group=pygame.sprite.Group(); self.boss_group=pygame.sprite.GroupSingle()
-        self.bullets=pygame.sprite.Group(); self.enemy_bullets=pygame.sprite.Group(); self.particles=pygame.sprite.Group(); self.powerups=pygame.sprite.Group()
-        self.state='menu'; self.score=0; self.level=1; self.world_time=0; self.shake_timer=0
+        self.bullets=pygame.sprite.Group(); self.enemy_bullets=BulletField(); self.particles=pygame.sprite.Group(); self.powerups=pygame.sprite.Group()
+        self.reset()
+
+    def reset(self):
+        """Estado de una partida nueva; cabe de sobra en un frame."""
+        for g in (self.enemy_group,self.boss_group,self.bullets,self.enemy_bullets,self.particles,self.powerups): g.empty()
+        self.player=Player(); self.player_group.add(self.player)
+        self.state='menu'; self.score=0; self.level=1; self.world_time=0; self.shake_timer=0; self.shaking=False
         self.enemy_dir=1; self.enemy_speed=40; self.enemy_descend=18; self.enemy_fire_cool=1.4; self.enemy_fire_timer=0; self.anim_frame=0; self.anim_timer=0
-        self.audio=Audio(); self.brand='JPortas Desing Vintage'
-        self.logo=None
-        try:
-            self.logo=pygame.image.load('assets/icon.png').convert_alpha()
-        except Exception: self.logo=None
         self.spawn_wave(self.level)
 
+    def reseed(self,seed):
+        """Reinicia todos los RNG de la partida a partir de `seed`."""
+        self.seed=seed
+        for name,rng in self.rng.items(): rng.seed(f"{seed}:{name}")
+
     def spawn_wave(self,level):
         self.enemy_group.empty(); self.boss_group.empty()
         if level%3==0:
@@ -303,19 +405,20 @@ class Game:
             if self.audio.enabled: self.audio.s('roar')
             return
         rows=min(6,3+level); cols=10; mx=70; my=70; sx=60; sy=70
-        palette=[(255,120,120),(255,180,120),(255,230,120),(160,230,140),(150,200,255),(210,160,255)]
+        palette=ENEMY_PALETTE
         for r in range(rows):
             for c in range(cols):
                 x=sx+c*mx; y=sy+r*my
-                self.enemy_group.add(Enemy((x,y),palette[r%len(palette)],frame=random.randint(0,1)))
+                self.enemy_group.add(Enemy((x,y),palette[r%len(palette)],frame=self.rng['waves'].randint(0,1)))
         self.enemy_dir=1; self.enemy_speed=40+12*(level-1); self.enemy_descend=18+2*(level-1); self.enemy_fire_cool=max(0.6,1.4-0.08*(level-1)); self.enemy_fire_timer=0
 
     def add_explosion(self,pos,col):
+        fx=self.rng['fx']
         for _ in range(16):
-            a=random.uniform(0,2*math.pi); s=random.uniform(120,320)
+            a=fx.uniform(0,2*math.pi); s=fx.uniform(120,320)
             vx=math.cos(a)*s; vy=math.sin(a)*s
-            c=(min(255,int(col[0]+random.randint(-20,20))),min(255,int(col[1]+random.randint(-20,20))),min(255,int(col[2]+random.randint(-20,20))))
-            self.particles.add(Particle(pos,c,(vx,vy),lifetime=random.uniform(0.35,0.8)))
+            c=(min(255,int(col[0]+fx.randint(-20,20))),min(255,int(col[1]+fx.randint(-20,20))),min(255,int(col[2]+fx.randint(-20,20))))
+            self.particles.add(Particle(pos,c,(vx,vy),lifetime=fx.uniform(0.35,0.8)))
         self.shake_timer=0.15
         if self.audio.enabled: self.audio.s('expl')
 
@@ -326,47 +429,39 @@ class Game:
             if col not in columns or e.rect.y>columns[col].rect.y: columns[col]=e
         shooters=list(columns.values())
         if shooters:
-            e=random.choice(shooters)
-            self.enemy_bullets.add(Bullet(e.rect.centerx,e.rect.bottom+6,260,(255,140,140),'enemy'))
+            e=self.rng['fire'].choice(shooters)
+            self.enemy_bullets.spawn(e.rect.centerx,e.rect.bottom+6,0,260,(255,140,140))
 
     def boss_fire(self,boss):
         if boss.phase==1:
             for ang in range(-45,46,15):
-                a=math.radians(90+ang); vx=220*math.cos(a); vy=220*math.sin(a)
-                b=Bullet(boss.rect.centerx,boss.rect.bottom-10,0,(255,120,180),'enemy'); b.vx=vx; b.vy=vy
-                def upd(selfb,dt):
-                    selfb.rect.x+=int(selfb.vx*dt); selfb.rect.y+=int(selfb.vy*dt)
-                    if selfb.rect.bottom<0 or selfb.rect.top>HEIGHT or selfb.rect.right<0 or selfb.rect.left>WIDTH: selfb.kill()
-                b.update=upd.__get__(b,Bullet); self.enemy_bullets.add(b)
+                a=math.radians(90+ang)
+                self.enemy_bullets.spawn(boss.rect.centerx,boss.rect.bottom-10,220*math.cos(a),220*math.sin(a),(255,120,180))
         else:
             if self.player.alive:
                 px,py=self.player.rect.center
                 for i in range(3):
                     dx=px-boss.rect.centerx; dy=py-boss.rect.centery
                     ang=math.atan2(dy,dx); sp=300+i*40
-                    vx=math.cos(ang)*sp; vy=math.sin(ang)*sp
-                    b=Bullet(boss.rect.centerx,boss.rect.centery+20,0,(255,180,120),'enemy'); b.vx,b.vy=vx,vy
-                    def upd(selfb,dt):
-                        selfb.rect.x+=int(selfb.vx*dt); selfb.rect.y+=int(selfb.vy*dt)
-                        if selfb.rect.bottom<0 or selfb.rect.top>HEIGHT or selfb.rect.right<0 or selfb.rect.left>WIDTH: selfb.kill()
-                    b.update=upd.__get__(b,Bullet); self.enemy_bullets.add(b)
+                    self.enemy_bullets.spawn(boss.rect.centerx,boss.rect.centery+20,math.cos(ang)*sp,math.sin(ang)*sp,(255,180,120))
 
     def handle_collisions(self):
+        drops=self.rng['drops']; fx=self.rng['fx']
         hits=pygame.sprite.groupcollide(self.enemy_group,self.bullets,False,True)
         for enemy,bullets in hits.items():
             self.add_explosion(enemy.rect.center,enemy.color); enemy.kill(); self.score+=10
-            if random.random()<0.12: self.powerups.add(PowerUp(enemy.rect.center))
+            if drops.random()<0.12: self.powerups.add(PowerUp(enemy.rect.center,drops.choice(PowerUp.TYPES)))
         if self.boss_group:
             boss=self.boss_group.sprite
             if boss:
                 collisions=pygame.sprite.spritecollide(boss,self.bullets,True)
                 for _ in collisions:
-                    boss.hp-=5; self.add_explosion((boss.rect.centerx+random.randint(-20,20),boss.rect.centery+random.randint(-20,20)),(250,160,250)); self.score+=2
+                    boss.hp-=5; self.add_explosion((boss.rect.centerx+fx.randint(-20,20),boss.rect.centery+fx.randint(-20,20)),(250,160,250)); self.score+=2
                 if boss and boss.hp<=0:
                     self.add_explosion(boss.rect.center,(250,160,250)); self.score+=300; boss.kill()
-                    if random.random()<0.8: self.powerups.add(PowerUp((WIDTH//2,260),kind=random.choice(['rapid','shield'])))
+                    if drops.random()<0.8: self.powerups.add(PowerUp((WIDTH//2,260),drops.choice(['rapid','shield'])))
         if self.player.alive:
-            phit=pygame.sprite.spritecollide(self.player,self.enemy_bullets,True)
+            phit=self.enemy_bullets.collide(self.player.rect)
             if phit:
                 if self.player.shield_timer>0:
                     self.add_explosion((self.player.rect.centerx,self.player.rect.top),(150,210,255))
@@ -412,6 +507,10 @@ class Game:
             y+=s.get_height()+(10 if not small else 6)
 
     def frame(self,dt):
+        self.update(dt); self.draw()
+
+    def update(self,dt):
+        self.audio.pump()
         self.world_time+=dt
         move_dir=0
         keys=pygame.key.get_pressed()
@@ -421,6 +520,9 @@ class Game:
         for ev in pygame.event.get():
             if ev.type==pygame.QUIT:
                 pygame.quit(); sys.exit()
+            if ev.type==pygame.KEYDOWN and ev.key==pygame.K_F3:
+                if self.pacer: self.pacer.show=not self.pacer.show
+                continue
             if self.state=='menu' and (ev.type==pygame.KEYDOWN or ev.type==pygame.MOUSEBUTTONDOWN):
                 self.reset(); self.state='playing'
             elif self.state=='playing' and ev.type==pygame.KEYDOWN and ev.key==pygame.K_p:
@@ -465,38 +567,106 @@ class Game:
                         self.enemy_fire(); self.enemy_fire_timer=self.enemy_fire_cool
             self.handle_collisions()
 
+        self.shaking=self.shake_timer>0
+        if self.shaking: self.shake_timer-=dt
+
+    def draw(self):
+        # Siempre pantalla completa y flip(): en el navegador SDL copia el canvas entero al presentar,
+        # así que display.update(rects) no ahorraría nada (lo que se ahorra son frames, ver FramePacer)
         ox=oy=0
-        if hasattr(self,'shake_timer') and self.shake_timer>0:
-            self.shake_timer-=dt; import random as rr
-            amp=4; ox=int((rr.random()-0.5)*2*amp); oy=int((rr.random()-0.5)*2*amp)
+        if self.shaking:
+            shake=self.rng['shake']; amp=4; ox=int((shake.random()-0.5)*2*amp); oy=int((shake.random()-0.5)*2*amp)
 
         self.sky.draw(self.screen)
-        for g in (self.powerups, self.enemy_group, self.boss_group, self.bullets, self.enemy_bullets, self.player_group, self.particles):
+        for g in (self.powerups, self.enemy_group, self.boss_group, self.bullets):
+            for spr in g: self.screen.blit(spr.image, spr.rect.move(ox,oy))
+        self.enemy_bullets.draw(self.screen,ox,oy)
+        for g in (self.player_group, self.particles):
             for spr in g: self.screen.blit(spr.image, spr.rect.move(ox,oy))
         self.player.draw_extras(self.screen,getattr(self,'world_time',0))
         self.draw_hud()
         if self.state=='menu':
             self.draw_center_text([("SPACE BLUE SKY +",WHITE),(self.brand,(224,186,94)),("Haz clic/toca para empezar",(255,255,180))])
-            if self.logo:
-                lg=pygame.transform.smoothscale(self.logo,(140,140)); self.screen.blit(lg,(960-160,20))
+            if self.logo: self.screen.blit(self.logo,(960-160,20))
         elif self.state=='paused':
             self.draw_center_text([("PAUSA",WHITE),("Pulsa P para reanudar",(255,255,180))])
         elif self.state=='gameover':
             self.draw_center_text([("GAME OVER",(255,180,180)),(f"Puntuación: {self.score}",WHITE),(f"Oleada: {self.level}",WHITE),("Clic/tocar para reiniciar",(255,255,180))])
+        if self.pacer and self.pacer.show:
+            t=self.font.render(self.pacer.summary(),True,HUD_COLOR); self.screen.blit(t,(16,HEIGHT-28))
         pygame.display.flip()
+        if self.time_to_first_frame is None: self.time_to_first_frame=(pygame.time.get_ticks()-self.boot)/1000.0
 
-    def reset(self):
-        self.__init__(self.screen)
+def page_hidden():
+    # En el navegador (pygbag) cuenta la visibilidad de la pestaña; en escritorio, la ventana minimizada
+    if sys.platform=='emscripten':
+        try:
+            import platform
+            return bool(platform.window.document.hidden)
+        except Exception: return False
+    return not pygame.display.get_active()
+
+class FramePacer:
+    # Ritmo del bucle async. Como mucho `fps` frames por segundo; el tiempo real de cada frame se
+    # simula en pasos de como mucho `max_dt` s (así una bala no atraviesa a un enemigo por un dt
+    # enorme) y, como mucho, `max_steps` pasos por frame: lo que sobre (un tirón, volver de otra
+    # pestaña) se descarta. Si actualizar ya se comió el presupuesto del frame no se dibuja, hasta
+    # `max_skip` frames seguidos. Con la página oculta se paran la simulación y el audio.
+    def __init__(self,fps=60,max_dt=1/30,max_steps=4,max_skip=2,clock=time.perf_counter):
+        self.fps=fps; self.budget=1.0/fps; self.max_dt=max_dt; self.max_steps=max_steps; self.max_skip=max_skip
+        self.clock=clock; self.last=None; self.deadline=0.0; self.skipped=0; self.hidden=False; self.show=False
+        self.frames=0; self.rendered=0; self.dropped=0; self.discarded_s=0.0
+        self.achieved_fps=0.0; self.window_t=clock(); self.window_frames=0
+    def steps(self,now):
+        """dt de cada paso de simulación de este frame."""
+        if self.last is None: real=self.budget; self.deadline=now
+        else: real=now-self.last
+        self.last=now
+        limit=self.max_dt*self.max_steps
+        if real>limit: self.discarded_s+=real-limit; real=limit
+        n=max(1,math.ceil(real/self.max_dt-1e-9))
+        return [real/n]*n
+    def summary(self):
+        return f"FPS {self.achieved_fps:.1f}/{self.fps}  sin dibujar {self.dropped}  descartado {self.discarded_s:.1f} s"
+    def stats(self):
+        return {'fps':self.achieved_fps,'frames':self.frames,'rendered':self.rendered,'dropped':self.dropped,'discarded_s':self.discarded_s}
+    async def run(self,game,hidden=page_hidden):
+        while True:
+            if hidden():
+                if not self.hidden: self.hidden=True; game.audio.pause_all()
+                pygame.event.pump(); self.last=None
+                await asyncio.sleep(0.25); continue
+            if self.hidden:
+                self.hidden=False
+                if game.state!='paused': game.audio.resume_all()
+            start=self.clock()
+            for dt in self.steps(start): game.update(dt)
+            self.frames+=1
+            if self.clock()-start>self.budget and self.skipped<self.max_skip:
+                self.skipped+=1; self.dropped+=1
+            else:
+                self.skipped=0; game.draw(); self.rendered+=1; self.window_frames+=1
+            now=self.clock()
+            if now-self.window_t>=0.5:
+                self.achieved_fps=self.window_frames/(now-self.window_t); self.window_t=now; self.window_frames=0
+            # siguiente frame en su hora; si ya vamos tarde, sin esperar (pero cediendo el control)
+            self.deadline=max(self.deadline+self.budget,now)
+            await asyncio.sleep(self.deadline-now)
+
+def draw_loading(screen,done,total):
+    screen.fill(SKY_TOP); w=WIDTH//3; x=(WIDTH-w)//2; y=HEIGHT//2-5
+    pygame.draw.rect(screen,(70,120,200),(x,y,w,10),border_radius=5)
+    pygame.draw.rect(screen,WHITE,(x,y,w*done//total,10),border_radius=5)
 
 async def main():
     pygame.init()
     screen=pygame.display.set_mode((WIDTH,HEIGHT))
     pygame.display.set_caption('Space Blue Sky + — JPortas Desing Vintage (Web)')
-    g=Game(screen)
-    last=pygame.time.get_ticks()
-    while True:
-        now=pygame.time.get_ticks(); dt=(now-last)/1000.0; last=now
-        g.frame(dt)
-        await asyncio.sleep(0)
-
-asyncio.run(main())
+    # pantalla de carga: los recursos de arranque se construyen en rodajas de ~12 ms por frame
+    for done,total in ASSETS.prewarm('boot',slice_ms=12):
+        draw_loading(screen,done,total); pygame.display.flip(); await asyncio.sleep(0)
+    pacer=FramePacer()
+    await pacer.run(Game(screen,pacer))
+
+if __name__=='__main__':
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+# soundcache.py
+# Caché en disco de sonidos sintetizados, direccionada por contenido.
+# Cada sonido se describe con una "receta": una tupla (función, *args) cuyos argumentos
+# pueden ser a su vez recetas, p.ej.
+#     (mix_tracks, (synth_noise, 0.22, 0.35), (synth_square, 110, 0.22, 0.2))
+# La clave es el hash de la receta normalizada (nombre de función, todos los argumentos con
+# sus valores por defecto, incluidos sample_rate y seed) y el valor, PCM int16 en crudo.
+#
+# El cuerpo de las funciones no entra en la clave: los datos de los que depende una receta (una
+# secuencia de notas, un tempo) se le pasan como argumentos para que formen parte de ella, y al
+# cambiar el código de una función se sube su atributo `cache_version`, lo que invalida solo sus
+# entradas. CACHE_VERSION invalida la caché completa (cambio de formato).
+
+import hashlib
+import inspect
+import os
+import struct
+import sys
+import zlib
+
+import chipsynth
+
+CACHE_VERSION = 1
+_MAGIC = b'SBSC'
+_HEADER = struct.Struct('<4sHII')   # magic, versión, nº de samples, crc32 de los datos
+
+
+def default_cache_dir():
+    """Directorio de caché del usuario (se puede forzar con SPACEBLUESKY_CACHE)."""
+    env = os.environ.get('SPACEBLUESKY_CACHE')
+    if env:
+        return env
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'space_bluesky', 'sounds')
+
+
+def _is_recipe(x):
+    return isinstance(x, tuple) and bool(x) and callable(x[0])
+
+
+def canonical(recipe):
+    """Texto estable que identifica la receta (la base de la clave)."""
+    if isinstance(recipe, (tuple, list)) and not _is_recipe(recipe):
+        return '(' + ', '.join(canonical(x) for x in recipe) + ')'
+    if not _is_recipe(recipe):
+        return repr(recipe)
+    fn, *args = recipe
+    bound = inspect.signature(fn).bind(*args)
+    bound.apply_defaults()
+    params = ', '.join(f"{k}={canonical(v)}" for k, v in bound.arguments.items())
+    return f"{fn.__qualname__}@{getattr(fn, 'cache_version', 0)}({params})"
+
+
+def recipe_key(recipe):
+    text = f"v{CACHE_VERSION}:{canonical(recipe)}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def render(recipe):
+    """Ejecuta la receta (sin caché)."""
+    if not _is_recipe(recipe):
+        return recipe
+    fn, *args = recipe
+    return fn(*[render(a) for a in args])
+
+
+class SoundCache:
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pcm')
+
+    def fetch(self, recipe):
+        """Buffer PCM int16 de la receta: del disco si hay una entrada válida, si no se sintetiza y se guarda."""
+        key = recipe_key(recipe)
+        pcm = self._load(key)
+        if pcm is not None:
+            self.hits += 1
+            return pcm
+        self.misses += 1
+        pcm = chipsynth.to_pcm16(render(recipe))
+        self._store(key, pcm)
+        return pcm
+
+    def _load(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, n, crc = _HEADER.unpack_from(data)
+        body = data[_HEADER.size:]
+        if magic != _MAGIC or version != CACHE_VERSION or len(body) != 2*n or zlib.crc32(body) != crc:
+            return None
+        return chipsynth.pcm_from_bytes_le(body)
+
+    def _store(self, key, pcm):
+        body = chipsynth.pcm_bytes_le(pcm)
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, CACHE_VERSION, len(pcm), zlib.crc32(body)))
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            # Sin disco escribible (solo lectura, navegador...): se sigue sin caché
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
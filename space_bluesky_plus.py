@@ -3,20 +3,64 @@
 # power-ups y JEFES cada 3 oleadas.
 # Autor: M365 Copilot para Joaquín Portas Alés
 
+import argparse
+import bisect
+import collections
+import csv
+import json
 import math
 import random
+import struct
 import sys
 import time
 import io
+import itertools
+import threading
 import wave
-import struct
 import pygame
 
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+import assets
+import chipsynth
+import soundcache
+
 # ------------------------------
 # Configuración general
 # ------------------------------
 WIDTH, HEIGHT = 920, 700
-FPS = 60
+FPS = 60        # tope de frames dibujados por segundo
+SIM_HZ = 120    # ticks de simulación por segundo (fijo: la jugabilidad no depende de los FPS)
+MAX_FRAME_DT = 0.25   # un frame más largo (ventana arrastrada, tirón) no se intenta recuperar entero
+DIRTY_SKY_HZ = 6      # con --dirty el cielo avanza a saltos: cada desplazamiento es un redibujado completo
+
+
+class Difficulty(collections.namedtuple('Difficulty', [
+        'enemy_speed', 'enemy_speed_step', 'descend', 'descend_step',
+        'fire_cool', 'fire_cool_step', 'fire_cool_min',
+        'boss_hp', 'boss_hp_step', 'boss_speed', 'boss_speed_step',
+        'boss_fire_cool', 'boss_fire_cool_step', 'boss_fire_cool_min', 'boss_shot_speed'],
+        defaults=(40, 12, 18, 2, 1.4, 0.08, 0.6, 150, 60, 120, 10, 1.2, 0.05, 0.7, 1.0))):
+    """Curvas de dificultad: valor de la primera oleada (o del primer jefe) y cuánto cambia en
+    cada una de las siguientes. Los valores por defecto son los del juego; sweep.py los varía."""
+    __slots__ = ()
+
+    def wave(self, level):
+        """(velocidad, descenso, enfriamiento de disparo) de la oleada `level`."""
+        n = level - 1
+        return (self.enemy_speed + self.enemy_speed_step * n,
+                self.descend + self.descend_step * n,
+                max(self.fire_cool_min, self.fire_cool - self.fire_cool_step * n))
+
+    def boss(self, level):
+        """(vida, velocidad, enfriamiento de disparo) del jefe de la oleada `level`."""
+        n = max(1, level // 3) - 1
+        return (self.boss_hp + self.boss_hp_step * n,
+                self.boss_speed + self.boss_speed_step * n,
+                max(self.boss_fire_cool_min, self.boss_fire_cool - self.boss_fire_cool_step * n))
 
 # Colores
 WHITE = (255, 255, 255)
@@ -39,140 +83,213 @@ NOTE_FREQS = {
 }
 
 def _to_wav_bytes(samples, sample_rate=SAMPLE_RATE):
-    """Convierte una lista/iterable de enteros 16-bit a un WAV en memoria (mono)."""
+    """Convierte una pista de enteros 16-bit a un WAV en memoria (mono). Solo para exportar."""
     buf = io.BytesIO()
     with wave.open(buf, 'wb') as wf:
         wf.setnchannels(1)
         wf.setsampwidth(2)
         wf.setframerate(sample_rate)
-        data = b''.join(struct.pack('<h', max(-32768, min(32767, int(s)))) for s in samples)
-        wf.writeframes(data)
+        wf.writeframes(chipsynth.pcm_bytes_le(chipsynth.to_pcm16(samples)))
     buf.seek(0)
     return buf
 
 
+def export_wav(path, samples, sample_rate=SAMPLE_RATE):
+    """Guarda una pista como fichero WAV (p.ej. export_wav('musica.wav', build_melody(132)))."""
+    with open(path, 'wb') as f:
+        f.write(_to_wav_bytes(samples, sample_rate).getvalue())
+
+
 def synth_square(freq, duration, volume=0.4, sample_rate=SAMPLE_RATE):
-    n = int(duration * sample_rate)
-    if freq <= 0:
-        return [0]*n
-    period = sample_rate / freq
-    samples = []
-    amp = int(32767 * volume)
-    # Fade corto para evitar clicks
-    fade = min(120, n//20)
-    for i in range(n):
-        t = (i % period) < (period/2)
-        val = amp if t else -amp
-        if i < fade:
-            val = int(val * (i/fade))
-        if i > n-fade:
-            val = int(val * ((n-i)/fade))
-        samples.append(val)
-    return samples
-
-
-def synth_noise(duration, volume=0.35, sample_rate=SAMPLE_RATE):
-    n = int(duration * sample_rate)
-    amp = int(32767 * volume)
-    rnd = random.Random(123)
-    samples = []
-    fade = min(120, n//20)
-    for i in range(n):
-        val = rnd.randint(-amp, amp)
-        if i < fade:
-            val = int(val * (i/fade))
-        if i > n-fade:
-            val = int(val * ((n-i)/fade))
-        samples.append(val)
-    return samples
+    # Fade corto para evitar clicks (ver chipsynth._fade)
+    return chipsynth.square(freq, duration, volume, sample_rate)
+
+
+def synth_noise(duration, volume=0.35, sample_rate=SAMPLE_RATE, seed=123):
+    return chipsynth.noise(duration, volume, seed=seed, sample_rate=sample_rate)
 
 
 def mix_tracks(*tracks):
     """Suma listas de samples alineadas (mono) normalizando si hace falta."""
-    if not tracks:
-        return []
-    L = max(len(t) for t in tracks)
-    out = [0]*L
-    for t in tracks:
-        for i, s in enumerate(t):
-            out[i] += s
-    # normalización suave
-    peak = max(1, max(abs(x) for x in out))
-    if peak > 30000:
-        scale = 30000/peak
-        out = [int(x*scale) for x in out]
-    return out
-
-
-def build_melody(bpm=120):
+    return chipsynth.mix(*tracks, limit=30000)
+
+
+# Patrón simple chiptune (A-minor feel): (nota, duración en negras)
+MELODY = (
+    ('A4', 0.5), ('C5', 0.5), ('E5', 0.5), ('C5', 0.5),
+    ('A4', 0.5), ('D5', 0.5), ('F5', 0.5), ('D5', 0.5),
+    ('A4', 0.5), ('C5', 0.5), ('E5', 0.5), ('G5', 0.5),
+    ('F5', 0.5), ('E5', 0.5), ('D5', 0.5), ('C5', 0.5),
+)
+
+
+def build_melody(bpm=120, melody=MELODY):
+    """Una vuelta completa del patrón (para exportar; en juego la música va por MusicStream)."""
     beat = 60.0/bpm
-    # Patrón simple chiptune (A-minor feel)
-    seq = [
-        ('A4', beat*0.5), ('C5', beat*0.5), ('E5', beat*0.5), ('C5', beat*0.5),
-        ('A4', beat*0.5), ('D5', beat*0.5), ('F5', beat*0.5), ('D5', beat*0.5),
-        ('A4', beat*0.5), ('C5', beat*0.5), ('E5', beat*0.5), ('G5', beat*0.5),
-        ('F5', beat*0.5), ('E5', beat*0.5), ('D5', beat*0.5), ('C5', beat*0.5),
-    ]
-    samples = []
-    for note, dur in seq:
-        f = NOTE_FREQS.get(note, 0)
-        samples.extend(synth_square(f, dur, volume=0.22))
+    samples = chipsynth.concat([synth_square(NOTE_FREQS.get(note, 0), beat*beats, volume=0.22) for note, beats in melody])
     # Batería 8-bit: bombo (ruido corto grave) en cada negra
-    bar = int(4*beat*SAMPLE_RATE)
-    drums = [0]*(len(samples))
     step = int(beat*SAMPLE_RATE)
     kick = synth_noise(beat*0.15, volume=0.25)
-    for i in range(0, len(drums), step):
-        for j, v in enumerate(kick):
-            if i+j < len(drums):
-                drums[i+j] += v
+    drums = chipsynth.pulse_train(len(samples), kick, step)
     return mix_tracks(samples, drums)
 
 
+# La melodía va en los argumentos y por tanto en la clave de la caché (ver soundcache); si cambia
+# el cuerpo (volúmenes, batería) o NOTE_FREQS, hay que subir esto.
+build_melody.cache_version = 1
+
+
+def make_music_sequencer(bpm=132):
+    """Secuenciador en streaming equivalente a build_melody(bpm) en bucle."""
+    notes = [(NOTE_FREQS.get(note, 0), beats) for note, beats in MELODY]
+    return chipsynth.Sequencer(notes, bpm=bpm, lead_volume=0.22, kick_volume=0.25, kick_seed=123)
+
+
+# Recetas de los sonidos del juego (ver soundcache): la caché en disco se indexa por ellas.
+# El orden es el de prioridad de carga: primero los SFX cortos y frecuentes.
+SFX_RECIPES = {
+    'shoot': (synth_square, 880, 0.06, 0.35),
+    'shoot_alt': (synth_square, 1320, 0.05, 0.30),
+    'power': (mix_tracks, (synth_square, 1200, 0.08, 0.25), (synth_square, 1600, 0.06, 0.20)),
+    'hit': (synth_square, 220, 0.12, 0.30),
+    'explosion': (mix_tracks, (synth_noise, 0.22, 0.35), (synth_square, 110, 0.22, 0.2)),
+    'boss_roar': (mix_tracks, (synth_square, 90, 0.5, 0.22), (synth_noise, 0.5, 0.12)),
+}
+
+
+def make_sound(samples):
+    """Sound del mixer a partir de samples en [-1, 1] (None si no hay mixer)."""
+    fmt = pygame.mixer.get_init()
+    if fmt is None:
+        return None
+    pcm = chipsynth.to_pcm16(samples)
+    freq, size, channels = fmt
+    if freq == SAMPLE_RATE and size == -16:
+        # Los samples van directos al mixer, sin codificar/decodificar un WAV
+        return pygame.mixer.Sound(buffer=chipsynth.interleave(pcm, channels))
+    # Dispositivo con otro formato: pygame se encarga de convertir desde WAV
+    return pygame.mixer.Sound(file=_to_wav_bytes(pcm))
+
+
+_sound_cache = None
+
+
+def make_sfx(key):
+    """Efecto de SFX_RECIPES, sacado de la caché de disco (o sintetizado y guardado en ella)."""
+    global _sound_cache
+    if _sound_cache is None:
+        _sound_cache = soundcache.SoundCache()
+    return make_sound(_sound_cache.fetch(SFX_RECIPES[key]))
+
+
+class MusicStream:
+    """Reproduce un Sequencer en trozos cortos encolados (Channel.queue) en un canal reservado.
+
+    Se renderiza como mucho CHUNK_SECONDS*2 por delante, así que la memoria no depende de la
+    duración de la canción y los cambios de tempo/intensidad no obligan a re-renderizar nada.
+    """
+    CHUNK_SECONDS = 0.25
+
+    def __init__(self, sequencer, channel, make_sound):
+        self.sequencer = sequencer
+        self.channel = channel
+        self.make_sound = make_sound
+        self.chunk = int(self.CHUNK_SECONDS * sequencer.sample_rate)
+        self.playing = False
+        # Anillo con los últimos trozos: mantiene vivos el que suena y el encolado
+        self.ring = collections.deque(maxlen=3)
+
+    def _next_sound(self):
+        snd = self.make_sound(self.sequencer.render(self.chunk))
+        self.ring.append(snd)
+        return snd
+
+    def start(self):
+        self.playing = True
+        self.update()
+
+    def stop(self):
+        self.playing = False
+        self.channel.stop()
+
+    def update(self):
+        if not self.playing:
+            return
+        if not self.channel.get_busy():
+            self.channel.play(self._next_sound())
+        if self.channel.get_queue() is None:
+            self.channel.queue(self._next_sound())
+
+
 class Audio:
-    def __init__(self):
+    def __init__(self, background=True, enabled=True):
         self.enabled = False
         self.channels = None
+        self.sfx = {}
+        self.music = None
+        self.music_mood = (132, 1.0)
+        # Segundos desde la creación hasta que cada asset está listo (métrica de arranque)
+        self.started_at = time.perf_counter()
+        self.ready_times = {}
+        self.ready = threading.Event()
+        if not enabled:
+            self.ready.set()
+            return
         try:
             if not pygame.mixer.get_init():
                 pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=1, buffer=512)
+            # El canal 0 queda reservado para la música, los SFX no lo pisan
+            pygame.mixer.set_reserved(1)
             self.enabled = True
         except Exception:
             self.enabled = False
+            self.ready.set()
             return
-        # Prepara SFX
-        self.sfx = {}
-        self.sfx['shoot'] = self._make_sound(synth_square(880, 0.06, 0.35))
-        self.sfx['shoot_alt'] = self._make_sound(synth_square(1320, 0.05, 0.30))
-        self.sfx['explosion'] = self._make_sound(mix_tracks(synth_noise(0.22, 0.35), synth_square(110, 0.22, 0.2)))
-        self.sfx['power'] = self._make_sound(mix_tracks(synth_square(1200, 0.08, 0.25), synth_square(1600, 0.06, 0.20)))
-        self.sfx['hit'] = self._make_sound(synth_square(220, 0.12, 0.30))
-        self.sfx['boss_roar'] = self._make_sound(mix_tracks(synth_square(90, 0.5, 0.22), synth_noise(0.5, 0.12)))
-        # Música (loop)
-        music_samples = build_melody(bpm=132)
-        self.music = self._make_sound(music_samples)
-        self.music_channel = None
-
-    def _make_sound(self, samples):
-        if not self.enabled:
-            return None
-        bio = _to_wav_bytes(samples)
+        # Los sonidos se preparan en segundo plano para no bloquear el primer frame;
+        # mientras tanto sfx_play/play_music no hacen nada.
+        if background:
+            threading.Thread(target=self._build_assets, name='audio-build', daemon=True).start()
+        else:
+            self._build_assets()
+
+    def _build_assets(self):
         try:
-            snd = pygame.mixer.Sound(file=bio)
-        except TypeError:
-            # Compatibilidad: versiones que usan keyword 'file' o no
-            snd = pygame.mixer.Sound(bio)
-        return snd
+            for key in SFX_RECIPES:
+                self.sfx[key] = ASSETS.get('sfx', key)
+                self.ready_times[key] = time.perf_counter() - self.started_at
+            # Música al final; se renderiza en streaming mientras suena
+            bpm, intensity = self.music_mood
+            sequencer = make_music_sequencer(bpm)
+            sequencer.intensity = intensity
+            self.music = MusicStream(sequencer, pygame.mixer.Channel(0), make_sound)
+            self.ready_times['music'] = time.perf_counter() - self.started_at
+        except Exception:
+            # Si algo falla el juego sigue, sin los sonidos que falten
+            pass
+        finally:
+            self.ready.set()
 
     def play_music(self):
         if not self.enabled or self.music is None:
             return
-        if self.music_channel is None or not self.music_channel.get_busy():
-            self.music_channel = self.music.play(loops=-1)
+        if not self.music.playing:
+            self.music.start()
 
     def stop_music(self):
-        if self.music_channel:
-            self.music_channel.stop()
+        if self.music:
+            self.music.stop()
+
+    def set_music_mood(self, bpm, intensity=1.0):
+        """Tempo (desde la siguiente vuelta del patrón) e intensidad de la música."""
+        self.music_mood = (bpm, intensity)
+        if self.music:
+            self.music.sequencer.set_tempo(bpm)
+            self.music.sequencer.intensity = intensity
+
+    def update(self):
+        """Llamar una vez por frame: mantiene la cola de la música llena."""
+        if self.music:
+            self.music.update()
 
     def pause_all(self):
         try:
@@ -207,6 +324,14 @@ def draw_vertical_gradient(surf, top_color, bottom_color):
         pygame.draw.line(surf, (r, g, b), (0, y), (w, y))
 
 
+def make_gradient_surface(size, top_color, bottom_color):
+    """Degradado vertical: se pinta una columna de 1 px y se estira (las filas son constantes)."""
+    w, h = size
+    column = pygame.Surface((1, h))
+    draw_vertical_gradient(column, top_color, bottom_color)
+    return pygame.transform.scale(column, (w, h))
+
+
 def make_player_surface(scale=1.0):
     w, h = int(60*scale), int(50*scale)
     s = pygame.Surface((w, h), pygame.SRCALPHA)
@@ -262,6 +387,29 @@ def make_boss_surface(scale=1.0, frame=0):
     return s
 
 
+def make_bullet_surface(color, w=4, h=12):
+    img = pygame.Surface((w, h), pygame.SRCALPHA)
+    pygame.draw.rect(img, color, (0, 0, w, h), border_radius=2)
+    return img
+
+
+def make_powerup_surface(kind):
+    img = pygame.Surface((22, 22), pygame.SRCALPHA)
+    pygame.draw.circle(img, PowerUp.COLORS[kind], (11, 11), 11)
+    pygame.draw.circle(img, (255, 255, 255), (11, 11), 10, width=2)
+    icon = "R" if kind == "rapid" else "S"
+    txt = ASSETS.get('powerup_font').render(icon, True, (20, 40, 60))
+    img.blit(txt, txt.get_rect(center=(11, 11)))
+    return img
+
+
+def make_particle_surface(color, alpha, size):
+    img = pygame.Surface((size, size), pygame.SRCALPHA)
+    r = size // 2
+    pygame.draw.circle(img, color + (alpha,), (r, r), r)
+    return img
+
+
 def make_cloud_surface(size=(200, 100), opacity=180, seed=None):
     rnd = random.Random(seed) if seed is not None else random
     w, h = size
@@ -276,72 +424,287 @@ def make_cloud_surface(size=(200, 100), opacity=180, seed=None):
     s.blit(base, (0, 0))
     return s
 
+
+def make_sky_strip(clouds, fused):
+    """Una capa del cielo horneada en una tira. `clouds` son (receta de la nube, x, y);
+    la tira empieza en sky_strip_origin(clouds, fused)."""
+    x0, y0 = sky_strip_origin(clouds, fused)
+    surfs = [(ASSETS.get('cloud', *recipe), (x - x0, y - y0)) for recipe, x, y in clouds]
+    right = max(x + surf.get_width() for surf, (x, _) in surfs) + x0
+    if fused:
+        # Fondo: degradado + capa lenta, opaco, anclado al borde izquierdo de la pantalla
+        # y con una pantalla de margen para poder desplazarse un buen rato sin re-hornear.
+        strip = pygame.transform.scale(ASSETS.get('sky_bg'), (max(2*WIDTH, right), HEIGHT))
+    else:
+        bottom = max(y + surf.get_height() for surf, (_, y) in surfs) + y0
+        strip = pygame.Surface((right - x0, bottom - y0), pygame.SRCALPHA)
+        # Blanco transparente: las nubes son blancas, así el color no se oscurece al mezclar
+        strip.fill((255, 255, 255, 0))
+    strip.blits(surfs, doreturn=False)
+    return strip
+
+
+def sky_strip_origin(clouds, fused):
+    if fused:
+        return 0, 0
+    return min(x for _, x, _ in clouds), min(y for _, _, y in clouds)
+
+
+# Fuentes, sprites, textos, cielo y sonidos: se crean al pedirlos por primera vez y se comparten
+# entre partidas (ver assets.py; `python assets.py space_bluesky_plus` muestra lo que cuesta cada
+# uno). Las familias con un número de miembros abierto (paletas, textos, tiras del cielo) están
+# acotadas: cada sprite distinto se dibuja una sola vez, pero añadir colores no las hace crecer
+# sin límite.
+ASSETS = assets.Assets()
+ASSETS.font('font', "arial", 22)
+ASSETS.font('bigfont', "arial", 44, bold=True)
+ASSETS.font('powerup_font', "arial", 14, bold=True)
+ASSETS.font('profiler_font', "consolas,dejavusansmono,couriernew", 14)
+ASSETS.register('player', lambda: make_player_surface(1.0))
+ASSETS.register('enemy', make_enemy_surface, max_entries=64)
+ASSETS.register('boss', make_boss_surface)
+ASSETS.register('bullet', make_bullet_surface, max_entries=64)
+ASSETS.register('powerup', make_powerup_surface)
+ASSETS.register('particle', make_particle_surface)   # acotada por ParticleSystem.MAX_COLORS
+# textos ya rasterizados, por (fuente, texto, color): rasterizar es de lo más caro del frame
+ASSETS.register('text', lambda font, text, color: font.render(text, True, color), max_entries=256)
+ASSETS.register('sky_bg', lambda: make_gradient_surface((WIDTH, HEIGHT), SKY_TOP, SKY_BOTTOM))
+ASSETS.register('cloud', make_cloud_surface)
+# cada capa guarda su tira viva; el registro conserva las últimas horneadas
+ASSETS.register('sky_strip', make_sky_strip, max_entries=6)
+ASSETS.register('sfx', make_sfx, kind='sound')
+ASSETS.define_set('boot', ['font', 'bigfont', 'powerup_font', 'player'])
+ASSETS.define_set('sprites', ['sky_bg'] + [('boss', 1.0, f) for f in (0, 1)]
+                  + [('powerup', k) for k in ("rapid", "shield")])
+ASSETS.define_set('sounds', [('sfx', k) for k in SFX_RECIPES])
+
+
+def render_text(font, text, color):
+    return ASSETS.get('text', font, text, color)
+
+
+def enemy_frame(color, scale=1.0, frame=0):
+    # El dibujo solo depende de la paridad del frame (el "bob")
+    return ASSETS.get('enemy', tuple(color), scale, frame % 2)
+
+
+def boss_frame(scale=1.0, frame=0):
+    return ASSETS.get('boss', scale, frame % 2)
+
+
+def bullet_image(color, w=4, h=12):
+    return ASSETS.get('bullet', tuple(color), w, h)
+
+
+def powerup_image(kind):
+    return ASSETS.get('powerup', kind)
+
 # ------------------------------
 # Entidades
 # ------------------------------
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, dy, color=(255, 250, 120), w=4, h=12, owner="player"):
+class Body:
+    """Posición en coma flotante (esquina superior izquierda del rect) más la del tick anterior.
+
+    La simulación mueve x/y y el rect sigue redondeado a ellas para las colisiones; al dibujar
+    se interpola entre (px, py) y (x, y) según lo que falte para el siguiente tick.
+    """
+    def place(self, x, y):
+        """Coloca sin interpolar desde la posición anterior (aparición, reinicio...)."""
+        self.x = self.px = float(x)
+        self.y = self.py = float(y)
+        self.rect.topleft = (round(self.x), round(self.y))
+
+    def move_by(self, dx, dy):
+        self.px = self.x
+        self.py = self.y
+        self.x += dx
+        self.y += dy
+        self.rect.topleft = (round(self.x), round(self.y))
+
+    def draw_pos(self, alpha=1.0):
+        return (round(self.px + (self.x - self.px) * alpha), round(self.py + (self.y - self.py) * alpha))
+
+
+class Pool:
+    """Reserva de entidades recicladas: acquire() reutiliza una libre o crea una nueva.
+
+    `created` solo crece cuando la reserva se queda corta; en régimen estable el juego
+    no debería crear entidades nuevas (ver Game.allocation_stats).
+    """
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            obj = self.cls(*args, **kwargs)
+            self.created += 1
+        obj.pooled = False
+        return obj
+
+    def release(self, obj):
+        if not obj.pooled:
+            obj.pooled = True
+            self.free.append(obj)
+
+
+class PooledSprite(pygame.sprite.Sprite):
+    """Sprite reciclable: kill() lo devuelve a la reserva de su clase."""
+    pool = None
+
+    def __init__(self, *args, **kwargs):
         super().__init__()
-        self.image = pygame.Surface((w, h), pygame.SRCALPHA)
-        pygame.draw.rect(self.image, color, (0, 0, w, h), border_radius=2)
+        self.pooled = False
+        self.reset(*args, **kwargs)
+
+    @classmethod
+    def acquire(cls, *args, **kwargs):
+        return cls.pool.acquire(*args, **kwargs)
+
+    def kill(self):
+        super().kill()
+        self.pool.release(self)
+
+
+class Bullet(Body, PooledSprite):
+    def reset(self, x, y, dy, color=(255, 250, 120), w=4, h=12, owner="player", vx=0):
+        self.image = bullet_image(color, w, h)
         self.rect = self.image.get_rect(center=(x, y))
+        self.place(*self.rect.topleft)
         self.dy = dy
+        self.vx = vx
         self.owner = owner
     def update(self, dt):
-        self.rect.y += int(self.dy * dt)
-        if self.rect.bottom < 0 or self.rect.top > HEIGHT:
-            self.kill()
-
-
-class Particle(pygame.sprite.Sprite):
-    def __init__(self, pos, color, vel, lifetime=0.6):
-        super().__init__()
-        self.image = pygame.Surface((6, 6), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, color, (3, 3), 3)
-        self.rect = self.image.get_rect(center=pos)
-        self.vx, self.vy = vel
-        self.lifetime = lifetime
-        self.age = 0.0
-    def update(self, dt):
-        self.age += dt
-        self.rect.x += int(self.vx * dt)
-        self.rect.y += int(self.vy * dt)
-        alpha = max(0, 255 - int(255 * (self.age / self.lifetime)))
-        self.image.set_alpha(alpha)
-        if self.age >= self.lifetime:
+        self.move_by(self.vx * dt, self.dy * dt)
+        if self.rect.bottom < 0 or self.rect.top > HEIGHT or self.rect.right < 0 or self.rect.left > WIDTH:
             self.kill()
 
 
-class PowerUp(pygame.sprite.Sprite):
+class PowerUp(Body, PooledSprite):
     TYPES = ("rapid", "shield")
     COLORS = {"rapid": (120, 255, 160), "shield": (160, 220, 255)}
-    def __init__(self, pos, kind=None):
-        super().__init__()
-        if kind is None:
-            kind = random.choice(PowerUp.TYPES)
+    def reset(self, pos, kind):
+        # el tipo lo elige quien lo suelta, con el RNG de la partida (ver Game.handle_collisions)
         self.kind = kind
-        self.image = pygame.Surface((22, 22), pygame.SRCALPHA)
-        color = PowerUp.COLORS[self.kind]
-        pygame.draw.circle(self.image, color, (11, 11), 11)
-        pygame.draw.circle(self.image, (255, 255, 255), (11, 11), 10, width=2)
-        icon = "R" if self.kind == "rapid" else "S"
-        font = pygame.font.SysFont("arial", 14, bold=True)
-        txt = font.render(icon, True, (20, 40, 60))
-        self.image.blit(txt, txt.get_rect(center=(11, 11)))
+        self.image = powerup_image(kind)
         self.rect = self.image.get_rect(center=pos)
+        self.place(*self.rect.topleft)
         self.vy = 120
     def update(self, dt):
-        self.rect.y += int(self.vy * dt)
+        self.move_by(0, self.vy * dt)
         if self.rect.top > HEIGHT:
             self.kill()
 
 
-class Player(pygame.sprite.Sprite):
+Bullet.pool = Pool(Bullet)
+PowerUp.pool = Pool(PowerUp)
+
+
+# Entrada de un tick: left/right mover, fire disparo mantenido (autofire con Ráfaga) y
+# pulsaciones sueltas: shoot (como pulsar Espacio), pause (P) y restart (empezar/reiniciar
+# desde el menú o el game over). La da el teclado o un controlador.
+Actions = collections.namedtuple('Actions', 'left right fire shoot pause restart', defaults=(False,) * 6)
+PULSES = ('shoot', 'pause', 'restart')   # solo cuentan en un tick
+
+
+def keyboard_actions(keys, shoot=False, pause=False, restart=False):
+    return Actions(left=bool(keys[pygame.K_LEFT] or keys[pygame.K_a]),
+                   right=bool(keys[pygame.K_RIGHT] or keys[pygame.K_d]),
+                   fire=bool(keys[pygame.K_SPACE] or keys[pygame.K_UP]),
+                   shoot=shoot, pause=pause, restart=restart)
+
+
+# ------------------------------
+# Grabación y reproducción de partidas
+# ------------------------------
+# Una partida queda determinada por la semilla del Game, los ticks por segundo y las Actions
+# de cada tick. El fichero guarda eso en binario: cabecera y después tramos
+# (máscara de bits de Actions, nº de ticks seguidos con esa máscara).
+REPLAY_MAGIC = b'SBSI'
+REPLAY_VERSION = 1
+_REPLAY_HEADER = struct.Struct('<4sHqHI')   # magic, versión, semilla, sim_hz, nº de ticks
+_REPLAY_RUN = struct.Struct('<BH')           # máscara, repeticiones
+
+
+def actions_mask(actions):
+    mask = 0
+    for bit, pressed in enumerate(actions):
+        if pressed:
+            mask |= 1 << bit
+    return mask
+
+
+def mask_actions(mask):
+    return Actions(*(bool(mask >> bit & 1) for bit in range(len(Actions._fields))))
+
+
+class InputRecorder:
+    """Va anotando las Actions de cada tick (ver Game.simulate) y las guarda con save()."""
+    def __init__(self, seed, sim_hz):
+        self.seed = seed
+        self.sim_hz = sim_hz
+        self.ticks = 0
+        self.runs = []   # [máscara, repeticiones]
+
+    def record(self, actions):
+        mask = actions_mask(actions)
+        runs = self.runs
+        if runs and runs[-1][0] == mask and runs[-1][1] < 0xFFFF:
+            runs[-1][1] += 1
+        else:
+            runs.append([mask, 1])
+        self.ticks += 1
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(_REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.sim_hz, self.ticks))
+            f.write(b''.join(_REPLAY_RUN.pack(mask, n) for mask, n in self.runs))
+
+
+class InputReplay:
+    """Devuelve, tick a tick, las Actions de una grabación; None cuando se acaba."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _REPLAY_HEADER.size:
+            raise ValueError(f"{path}: no es una grabación")
+        magic, version, self.seed, self.sim_hz, self.ticks = _REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path}: no es una grabación (o es de otra versión)")
+        body = memoryview(data)[_REPLAY_HEADER.size:]
+        self.runs = [(mask_actions(mask), n) for mask, n in _REPLAY_RUN.iter_unpack(body)]
+        self.pos = 0
+        self.left = self.runs[0][1] if self.runs else 0
+        self.played = 0
+
+    @property
+    def done(self):
+        return self.played >= self.ticks
+
+    def next(self):
+        if self.done:
+            return None
+        while not self.left:
+            self.pos += 1
+            self.left = self.runs[self.pos][1]
+        self.left -= 1
+        self.played += 1
+        return self.runs[self.pos][0]
+
+
+class Player(Body, pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
-        self.base_image = make_player_surface(1.0)
+        self.base_image = ASSETS.get('player')
         self.image = self.base_image.copy()
         self.rect = self.image.get_rect(midbottom=(WIDTH//2, HEIGHT-30))
+        self.place(*self.rect.topleft)
         self.speed = 360
         self.cooldown = 0.35
         self.cool_timer = 0.0
@@ -350,17 +713,20 @@ class Player(pygame.sprite.Sprite):
         self.rapid_timer = 0.0
         self.shield_timer = 0.0
         self.shield_radius = 40
-    def update(self, dt, keys):
+    def update(self, dt, actions):
         if not self.alive:
+            self.move_by(0, 0)
             return
         dx = 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if actions.left:
             dx -= self.speed * dt
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if actions.right:
             dx += self.speed * dt
-        self.rect.x += int(dx)
-        self.rect.left = max(self.rect.left, 10)
-        self.rect.right = min(self.rect.right, WIDTH-10)
+        self.move_by(dx, 0)
+        x = min(max(self.x, 10), WIDTH-10 - self.rect.width)
+        if x != self.x:
+            self.x = x
+            self.rect.x = round(x)
         self.cool_timer = max(0.0, self.cool_timer - dt)
         if self.rapid_timer > 0:
             self.rapid_timer -= dt
@@ -372,75 +738,557 @@ class Player(pygame.sprite.Sprite):
     def shoot(self, bullets_group, audio=None):
         ok, rate = self.can_shoot()
         if ok and self.alive:
-            bullet = Bullet(self.rect.centerx, self.rect.top-8, dy=-620, color=(255, 250, 180), owner="player")
+            bullet = Bullet.acquire(self.rect.centerx, self.rect.top-8, dy=-620, color=(255, 250, 180), owner="player")
             bullets_group.add(bullet)
             self.cool_timer = rate
             if audio:
                 audio.sfx_play('shoot' if self.rapid_timer<=0 else 'shoot_alt')
-    def draw_extras(self, surf, t):
+    def draw_extras(self, surf, t, pos=None):
+        """Llama y escudo alrededor de `pos` (esquina del sprite dibujado); devuelve los rectángulos dibujados."""
+        rect = self.rect if pos is None else self.rect.move(pos[0] - self.rect.x, pos[1] - self.rect.y)
+        rects = []
         if self.alive:
             flame_len = 10 + 6*math.sin(t*12)
             flame = pygame.Surface((12, int(18+flame_len)), pygame.SRCALPHA)
             pygame.draw.polygon(flame, (255, 200, 60, 210), [(6,0),(0,flame.get_height()),(12,flame.get_height())])
-            surf.blit(flame, (self.rect.centerx-6, self.rect.bottom-6))
+            rects.append(surf.blit(flame, (rect.centerx-6, rect.bottom-6)))
         if self.shield_timer > 0 and self.alive:
             alpha = 80 + int(40*math.sin(t*6))
-            pygame.draw.circle(surf, (150, 210, 255, alpha), self.rect.center, self.shield_radius, width=3)
+            rects.append(pygame.draw.circle(surf, (150, 210, 255, alpha), rect.center, self.shield_radius, width=3))
+        return rects
 
 
-class Enemy(pygame.sprite.Sprite):
+class Enemy(Body, pygame.sprite.Sprite):
     def __init__(self, pos, color, frame=0):
         super().__init__()
         self.frame = frame
         self.color = color
-        self.image = make_enemy_surface(color, 1.0, frame)
+        self.image = enemy_frame(color, 1.0, frame)
         self.rect = self.image.get_rect(topleft=pos)
+        self.place(*pos)
         self.alive = True
+        self.formation = None
+        self.slot = 0
+        self.col = 0
+        self.offset = (0, 0)
+    def kill(self):
+        if self.formation is not None:
+            self.formation.discard(self)
+            self.formation = None
+        super().kill()
     def animate(self, frame):
         self.frame = frame
-        self.image = make_enemy_surface(self.color, 1.0, self.frame)
+        self.image = enemy_frame(self.color, 1.0, self.frame)
 
 
-class Boss(pygame.sprite.Sprite):
-    def __init__(self, pos, level):
+class Boss(Body, pygame.sprite.Sprite):
+    def __init__(self, pos, level, difficulty=Difficulty()):
         super().__init__()
         self.frame = 0
-        self.image = make_boss_surface(1.0, self.frame)
+        self.image = boss_frame(1.0, self.frame)
         self.rect = self.image.get_rect(center=pos)
-        self.max_hp = 150 + 60*(max(1, level//3)-1)
+        self.place(*self.rect.topleft)
+        self.max_hp, self.speed_x, self.fire_cool = difficulty.boss(level)
         self.hp = self.max_hp
-        self.speed_x = 120 + 10*(max(1, level//3)-1)
         self.dir = 1
         self.fire_timer = 0.0
-        self.fire_cool = max(0.7, 1.2 - 0.05*(max(1, level//3)-1))
         self.anim_timer = 0.0
         self.phase_timer = 0.0
         self.phase = 1
     def update(self, dt):
-        self.rect.x += int(self.speed_x * self.dir * dt)
+        self.move_by(self.speed_x * self.dir * dt, 0)
         if self.rect.right >= WIDTH-10:
             self.dir = -1
-            self.rect.right = WIDTH-10
+            self.x = WIDTH-10 - self.rect.width
         elif self.rect.left <= 10:
             self.dir = 1
-            self.rect.left = 10
+            self.x = 10
+        self.rect.x = round(self.x)
         self.anim_timer += dt
         if self.anim_timer >= 0.3:
             self.anim_timer = 0.0
             self.frame = 1 - self.frame
-            self.image = make_boss_surface(1.0, self.frame)
+            self.image = boss_frame(1.0, self.frame)
         self.phase_timer += dt
         if self.phase_timer >= 6.0:
             self.phase_timer = 0.0
             self.phase = 2 if self.phase == 1 else 1
 
+
+class Formation:
+    """Índice de la oleada: la rejilla de enemigos que crea spawn_wave.
+
+    Todos los enemigos se mueven a la vez y los de una columna comparten x y tamaño, así
+    que basta con guardar por columna los supervivientes en orden de fila: el de arriba y
+    el de abajo dan los bordes de la formación y el tirador de esa columna. Las consultas
+    recorren columnas (como mucho `cols`) en vez de toda la oleada, y las bajas se
+    descuentan al matar el enemigo (Enemy.kill).
+
+    También sirve para dibujarla: como además comparten frame de animación, se guarda una
+    superficie con toda la formación por frame y se pinta con un solo blit en la posición
+    actual. Las bajas se recortan de esas superficies (los rects de cada enemigo se siguen
+    moviendo para las colisiones).
+    """
+    def __init__(self):
+        self.columns = {}   # col -> supervivientes de esa columna, de arriba abajo
+        self.count = 0
+        self.added = 0
+        self.bounds = None  # rect de la formación completa, relativo al primer enemigo
+        self.anchor = (0, 0)
+        self.frame = None   # None: cada enemigo con su frame inicial (antes de la primera animación)
+        self.surfaces = {}  # frame -> superficie con los supervivientes
+        self.holes = []
+        self.rebuilds = 0
+
+    def add(self, enemy, col):
+        """Registra un enemigo; hay que añadirlos en el mismo orden que al grupo, fila a fila."""
+        if not self.added:
+            self.anchor = enemy.rect.topleft
+        enemy.formation = self
+        enemy.slot = self.added
+        enemy.col = col
+        enemy.offset = (enemy.rect.x - self.anchor[0], enemy.rect.y - self.anchor[1])
+        cell = pygame.Rect(enemy.offset, enemy.rect.size)
+        self.bounds = cell if self.bounds is None else self.bounds.union(cell)
+        self.added += 1
+        self.count += 1
+        self.columns.setdefault(col, []).append(enemy)
+        self.surfaces.clear()
+
+    def discard(self, enemy):
+        members = self.columns.get(enemy.col)
+        if members and enemy in members:
+            members.remove(enemy)
+            self.count -= 1
+            if not members:
+                del self.columns[enemy.col]
+            self._punch(enemy)
+
+    def __len__(self):
+        return self.count
+
+    def left(self):
+        return min(m[0].rect.left for m in self.columns.values())
+
+    def right(self):
+        return max(m[0].rect.right for m in self.columns.values())
+
+    def bottom(self):
+        return max(m[-1].rect.bottom for m in self.columns.values())
+
+    def shooters(self, spacing):
+        """El enemigo más bajo de cada columna, como lo elegía el barrido por round(x/spacing).
+
+        Se conserva el mismo criterio (y por tanto la misma tirada del RNG de disparo): dos
+        columnas caen en la misma clave si round() las junta, gana la más baja y, a igual
+        altura, la primera en el orden del grupo; las claves van en el orden en que aparece
+        su primer enemigo en el grupo.
+        """
+        keys = {}
+        for members in self.columns.values():
+            top, low = members[0], members[-1]
+            key = round(low.rect.x / spacing)
+            cur = keys.get(key)
+            if cur is None:
+                keys[key] = [top.slot, low]
+                continue
+            cur[0] = min(cur[0], top.slot)
+            best = cur[1]
+            if low.rect.y > best.rect.y or (low.rect.y == best.rect.y and low.slot < best.slot):
+                cur[1] = low
+        return [low for _, low in sorted(keys.values(), key=lambda kv: kv[0])]
+
+    def members(self):
+        return [e for m in self.columns.values() for e in m]
+
+    def move(self, dx, dy):
+        for m in self.columns.values():
+            for e in m:
+                e.move_by(dx, dy)
+
+    def animate(self, frame):
+        self.frame = frame
+        self.surfaces.pop(None, None)   # el mosaico inicial ya no vuelve a usarse
+
+    def _image(self, enemy, frame):
+        return enemy.image if frame is None else enemy_frame(enemy.color, 1.0, frame)
+
+    def _cell(self, enemy):
+        bx, by = self.bounds.topleft
+        return pygame.Rect(enemy.offset[0] - bx, enemy.offset[1] - by, enemy.rect.width, enemy.rect.height)
+
+    def _build(self, frame):
+        surf = pygame.Surface(self.bounds.size, pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        surf.blits([(self._image(e, frame), self._cell(e)) for e in self.members()], doreturn=False)
+        # RLE: casi toda la superficie es hueco transparente entre enemigos
+        surf.set_alpha(255, pygame.RLEACCEL)
+        self.surfaces[frame] = surf
+        self.rebuilds += 1
+        return surf
+
+    def _punch(self, enemy):
+        if not self.surfaces:
+            return
+        hole = self._cell(enemy)
+        # vecinos que pisen la celda (en la rejilla del juego no hay, pero no cuesta nada)
+        around = [e for e in self.members() if self._cell(e).colliderect(hole)]
+        for frame, surf in self.surfaces.items():
+            surf.fill((0, 0, 0, 0), hole)
+            if around:
+                surf.set_clip(hole)
+                surf.blits([(self._image(e, frame), self._cell(e)) for e in around], doreturn=False)
+                surf.set_clip(None)
+        # la superficie sigue siendo la misma: el Renderer en modo dirty no ve el cambio solo
+        self.holes.append(enemy)
+
+    def take_holes(self, alpha=1.0):
+        """Zonas de pantalla recortadas desde la última llamada (para Renderer.invalidate)."""
+        holes = [pygame.Rect(e.draw_pos(alpha), e.rect.size) for e in self.holes]
+        self.holes = []
+        return holes
+
+    def blit_sequence(self, ox=0, oy=0, alpha=1.0):
+        """La formación como un único par (superficie, posición) para Surface.blits."""
+        if not self.count:
+            return []
+        surf = self.surfaces.get(self.frame)
+        if surf is None:
+            surf = self._build(self.frame)
+        first = next(iter(self.columns.values()))[0]
+        fx, fy = first.draw_pos(alpha)
+        x = fx - first.offset[0] + self.bounds.x + ox
+        y = fy - first.offset[1] + self.bounds.y + oy
+        return [(surf, (x, y))]
+
+# ------------------------------
+# Partículas (estructura de arrays)
+# ------------------------------
+class ParticleSystem:
+    """Partículas de explosión guardadas en arrays contiguos (posición, velocidad, edad, vida, color).
+
+    Se actualizan todas de una vez, las muertas se compactan y se dibujan con un único
+    Surface.blits/fblits usando frames ya desvanecidos: ni sprites ni set_alpha por partícula.
+    Usa NumPy si está disponible; si no, listas de Python.
+    """
+    FADE_LEVELS = 16
+    VARIANTS = 8          # tonos por color base (sustituyen al ±20 aleatorio por canal)
+    MAX_COLORS = 256      # tope de la paleta: colores base * VARIANTS
+    SIZE = 6
+
+    def __init__(self, capacity=1024, rng=None):
+        # RNG de las direcciones y vidas de cada explosión (por defecto, el global)
+        self.rng = rng or random
+        _rnd = random.Random(7)
+        self.offsets = [tuple(_rnd.randint(-20, 20) for _ in range(3)) for _ in range(self.VARIANTS)]
+        self.palette = {}     # (color base, variante) -> id de color
+        self.frames = []      # id*FADE_LEVELS + nivel -> superficie
+        self.count = 0
+        self.grows = 0
+        if np is not None:
+            self.data = np.zeros((6, capacity))   # x, y, vx, vy, edad, vida
+            self.cid = np.zeros(capacity, dtype=np.int32)
+        else:
+            self.data = [[] for _ in range(6)]
+            self.cid = []
+
+    def __len__(self):
+        return self.count
+
+    def _color_id(self, base, variant):
+        key = (tuple(base), variant)
+        cid = self.palette.get(key)
+        if cid is None:
+            if len(self.palette) >= self.MAX_COLORS:
+                return variant   # paleta llena: reutiliza un tono existente
+            cid = len(self.palette)
+            self.palette[key] = cid
+            off = self.offsets[variant]
+            color = tuple(max(0, min(255, int(base[i] + off[i]))) for i in range(3))
+            for level in range(self.FADE_LEVELS):
+                alpha = 255 - 255*level // self.FADE_LEVELS
+                self.frames.append(ASSETS.get('particle', color, alpha, self.SIZE))
+        return cid
+
+    def emit(self, pos, base_color, count=16):
+        """Explosión: `count` partículas en direcciones aleatorias desde `pos`."""
+        rows = [[] for _ in range(6)]
+        cids = []
+        rnd = self.rng
+        for _ in range(count):
+            angle = rnd.uniform(0, 2*math.pi)
+            speed = rnd.uniform(120, 320)
+            rows[0].append(pos[0])
+            rows[1].append(pos[1])
+            rows[2].append(math.cos(angle)*speed)
+            rows[3].append(math.sin(angle)*speed)
+            rows[4].append(0.0)
+            rows[5].append(rnd.uniform(0.35, 0.8))
+            cids.append(self._color_id(base_color, rnd.randrange(self.VARIANTS)))
+        n = self.count
+        if np is not None:
+            if n + count > self.cid.size:
+                cap = max(n + count, 2*self.cid.size)
+                data = np.zeros((6, cap))
+                data[:, :n] = self.data[:, :n]
+                cid = np.zeros(cap, dtype=np.int32)
+                cid[:n] = self.cid[:n]
+                self.data, self.cid = data, cid
+                self.grows += 1
+            self.data[:, n:n+count] = rows
+            self.cid[n:n+count] = cids
+        else:
+            for col, vals in zip(self.data, rows):
+                col.extend(vals)
+            self.cid.extend(cids)
+        self.count = n + count
+
+    def update(self, dt):
+        n = self.count
+        if not n:
+            return
+        if np is not None:
+            x, y, vx, vy, age, life = self.data[:, :n]
+            age += dt
+            x += vx * dt
+            y += vy * dt
+            alive = age < life
+            m = int(alive.sum())
+            if m < n:
+                self.data[:, :m] = self.data[:, :n][:, alive]
+                self.cid[:m] = self.cid[:n][alive]
+                self.count = m
+        else:
+            x, y, vx, vy, age, life = self.data
+            for i in range(n):
+                age[i] += dt
+                x[i] += vx[i] * dt
+                y[i] += vy[i] * dt
+            if any(a >= l for a, l in zip(age, life)):
+                keep = [i for i in range(n) if age[i] < life[i]]
+                self.data = [[col[i] for i in keep] for col in self.data]
+                self.cid = [self.cid[i] for i in keep]
+                self.count = len(keep)
+
+    def blit_sequence(self, ox=0, oy=0):
+        """Pares (superficie, posición) listos para Surface.blits."""
+        n = self.count
+        if not n:
+            return []
+        L = self.FADE_LEVELS
+        half = self.SIZE // 2
+        frames = self.frames
+        if np is not None:
+            x, y, _, _, age, life = self.data[:, :n]
+            level = np.minimum((age * L / life).astype(np.int32), L - 1)
+            idx = (self.cid[:n] * L + level).tolist()
+            xs = (x - half + ox).astype(np.int32).tolist()
+            ys = (y - half + oy).astype(np.int32).tolist()
+        else:
+            x, y, _, _, age, life = self.data
+            idx = [c*L + min(int(a*L/lf), L-1) for c, a, lf in zip(self.cid, age, life)]
+            xs = [int(v) - half + ox for v in x]
+            ys = [int(v) - half + oy for v in y]
+        return [(frames[k], (px, py)) for k, px, py in zip(idx, xs, ys)]
+
+    def draw(self, surf, ox=0, oy=0):
+        seq = self.blit_sequence(ox, oy)
+        if not seq:
+            return
+        if hasattr(surf, 'fblits'):
+            surf.fblits(seq)
+        else:
+            surf.blits(seq, doreturn=False)
+
+    def empty(self):
+        self.count = 0
+        if np is None:
+            self.data = [[] for _ in range(6)]
+            self.cid = []
+
+
+# ------------------------------
+# Balas enemigas (estructura de arrays)
+# ------------------------------
+class BulletField:
+    """Balas enemigas (oleadas y jefe) guardadas en arrays contiguos: posición de la esquina
+    superior izquierda y la del tick anterior (como Body), velocidad, color y quién disparó.
+
+    Se mueven todas de una vez, las que salen de la pantalla se descartan en la misma pasada,
+    el choque con el jugador es una sola prueba para todas y se dibujan con las imágenes
+    compartidas de cada color. Siguen las reglas de los sprites Bullet a los que sustituyen
+    (rect redondeado a la posición para descartar y chocar, posición interpolada al dibujar),
+    así que las partidas y las grabaciones no cambian. Usa NumPy si está disponible; si no,
+    listas de Python.
+    """
+    W, H = 4, 12
+    OWNERS = ("enemy", "boss")
+
+    def __init__(self, capacity=256):
+        self.color_ids = {}   # color -> id
+        self.images = []      # id -> superficie
+        self.count = 0
+        self.grows = 0
+        if np is not None:
+            self.data = np.zeros((6, capacity))   # x, y, px, py, vx, vy
+            self.cid = np.zeros(capacity, dtype=np.int32)
+            self.owner = np.zeros(capacity, dtype=np.int8)
+            # la esquina superior izquierda (x, y) de una bala que sigue en pantalla
+            self.low = np.array([[-self.W], [-self.H]], dtype=float)
+            self.high = np.array([[WIDTH], [HEIGHT]], dtype=float)
+        else:
+            self.data = [[] for _ in range(6)]
+            self.cid = []
+            self.owner = []
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, vx, vy, color, owner="enemy"):
+        """Bala centrada en (x, y)."""
+        c = self.color_ids.get(color)
+        if c is None:
+            c = self.color_ids[color] = len(self.images)
+            self.images.append(bullet_image(color, self.W, self.H))
+        o = self.OWNERS.index(owner)
+        x = float(int(x) - self.W // 2)
+        y = float(int(y) - self.H // 2)
+        n = self.count
+        if np is not None:
+            if n == self.cid.size:
+                data = np.zeros((6, 2*n))
+                data[:, :n] = self.data
+                cid = np.zeros(2*n, dtype=np.int32)
+                cid[:n] = self.cid
+                owners = np.zeros(2*n, dtype=np.int8)
+                owners[:n] = self.owner
+                self.data, self.cid, self.owner = data, cid, owners
+                self.grows += 1
+            self.data[:, n] = (x, y, x, y, vx, vy)
+            self.cid[n] = c
+            self.owner[n] = o
+        else:
+            for col, v in zip(self.data, (x, y, x, y, vx, vy)):
+                col.append(v)
+            self.cid.append(c)
+            self.owner.append(o)
+        self.count = n + 1
+
+    def _keep(self, keep):
+        if np is not None:
+            n = self.count
+            m = int(keep.sum())
+            self.data[:, :m] = self.data[:, :n][:, keep]
+            self.cid[:m] = self.cid[:n][keep]
+            self.owner[:m] = self.owner[:n][keep]
+            self.count = m
+        else:
+            self.data = [[v for v, k in zip(col, keep) if k] for col in self.data]
+            self.cid = [c for c, k in zip(self.cid, keep) if k]
+            self.owner = [o for o, k in zip(self.owner, keep) if k]
+            self.count = len(self.cid)
+
+    def update(self, dt):
+        n = self.count
+        if not n:
+            return
+        W, H = self.W, self.H
+        if np is not None:
+            data = self.data
+            pos = data[:2, :n]
+            data[2:4, :n] = pos
+            pos += data[4:6, :n] * dt
+            # el rect de la bala, redondeado como el de Body, fuera de la pantalla
+            r = np.rint(pos)
+            keep = ((r >= self.low) & (r <= self.high)).all(axis=0)
+            if not keep.all():
+                self._keep(keep)
+        else:
+            x, y, px, py, vx, vy = self.data
+            keep = []
+            for i in range(n):
+                px[i] = x[i]
+                py[i] = y[i]
+                x[i] += vx[i] * dt
+                y[i] += vy[i] * dt
+                rx, ry = round(x[i]), round(y[i])
+                keep.append(ry + H >= 0 and ry <= HEIGHT and rx + W >= 0 and rx <= WIDTH)
+            if not all(keep):
+                self._keep(keep)
+
+    def collide(self, rect):
+        """Quita las balas que tocan `rect` (como Rect.colliderect) y devuelve quién disparó
+        cada una ("enemy" o "boss"), en el orden en que aparecieron."""
+        n = self.count
+        if not n:
+            return []
+        W, H = self.W, self.H
+        if np is not None:
+            r = np.rint(self.data[:2, :n])
+            hit = ((r > ((rect.left - W,), (rect.top - H,))) & (r < ((rect.right,), (rect.bottom,)))).all(axis=0)
+            if not hit.any():
+                return []
+            owners = [self.OWNERS[o] for o in self.owner[:n][hit].tolist()]
+            self._keep(~hit)
+        else:
+            hit = [round(x) < rect.right and round(x) + W > rect.left and round(y) < rect.bottom and round(y) + H > rect.top
+                   for x, y in zip(self.data[0], self.data[1])]
+            if not any(hit):
+                return []
+            owners = [self.OWNERS[o] for o, h in zip(self.owner, hit) if h]
+            self._keep([not h for h in hit])
+        return owners
+
+    def rects(self):
+        """Rect de cada bala, en el orden en que aparecieron."""
+        if np is not None:
+            xs, ys = np.rint(self.data[:2, :self.count]).astype(np.int32).tolist()
+        else:
+            xs = [round(v) for v in self.data[0]]
+            ys = [round(v) for v in self.data[1]]
+        return [pygame.Rect(x, y, self.W, self.H) for x, y in zip(xs, ys)]
+
+    def blit_sequence(self, ox=0, oy=0, alpha=1.0):
+        """Pares (superficie, posición) listos para Surface.blits, interpolados como Body."""
+        n = self.count
+        if not n:
+            return []
+        if np is not None:
+            x, y, px, py = self.data[:4, :n]
+            xs = (np.rint(px + (x - px) * alpha) + ox).astype(np.int32).tolist()
+            ys = (np.rint(py + (y - py) * alpha) + oy).astype(np.int32).tolist()
+            cids = self.cid[:n].tolist()
+        else:
+            x, y, px, py = self.data[:4]
+            xs = [round(p + (v - p) * alpha) + ox for v, p in zip(x, px)]
+            ys = [round(p + (v - p) * alpha) + oy for v, p in zip(y, py)]
+            cids = self.cid
+        images = self.images
+        return [(images[c], (bx, by)) for c, bx, by in zip(cids, xs, ys)]
+
+    def empty(self):
+        self.count = 0
+        if np is None:
+            self.data = [[] for _ in range(6)]
+            self.cid = []
+            self.owner = []
+
+
 # ------------------------------
 # Fondo con nubes parallax
 # ------------------------------
 class Sky:
+    """Cielo con tres capas de nubes en parallax, precompuestas en tiras anchas.
+
+    Como todas las nubes de una capa avanzan a la misma velocidad, cada capa se hornea una
+    vez en una tira (ya en formato de pantalla) y por frame solo se desplaza la tira. El
+    degradado es constante en horizontal, así que se fusiona con la capa más lenta en una
+    tira opaca que hace de fondo: dibujar el cielo cuesta tres blits. Una capa solo se
+    vuelve a hornear cuando una de sus nubes reaparece por la derecha (o, la de fondo,
+    cuando ya no cubre la pantalla).
+    """
     def __init__(self):
-        self.bg = pygame.Surface((WIDTH, HEIGHT))
-        draw_vertical_gradient(self.bg, SKY_TOP, SKY_BOTTOM)
         self.layers = []
         rnd = random.Random(42)
         for i, (speed, opacity, size_range, count) in enumerate([
@@ -452,50 +1300,556 @@ class Sky:
             for c in range(count):
                 w = rnd.randint(size_range[0], size_range[1])
                 h = rnd.randint(int(w*0.45), int(w*0.65))
-                cloud = make_cloud_surface((w, h), opacity=opacity, seed=rnd.randint(0,99999))
+                recipe = ((w, h), opacity, rnd.randint(0,99999))
                 x = rnd.randint(0, WIDTH)
                 y = rnd.randint(20, HEIGHT//2)
-                clouds.append({"surf": cloud, "x": x, "y": y})
-            self.layers.append({"speed": speed, "clouds": clouds})
+                clouds.append({"recipe": recipe, "surf": ASSETS.get('cloud', *recipe), "x": x, "y": y})
+            self.layers.append({"speed": speed, "clouds": clouds, "strip": None, "strip_pos": (0, 0), "offset": 0.0})
+        self.bakes = 0
+        # el cielo avanza por frame, no por tick: con su propio RNG no altera el de la partida
+        self.rng = rnd
     def update(self, dt):
         for layer in self.layers:
             spd = layer["speed"]
+            layer["offset"] -= spd * dt
             for c in layer["clouds"]:
                 c["x"] -= spd * dt
                 if c["x"] + c["surf"].get_width() < 0:
-                    c["x"] = WIDTH + random.randint(20, 200)
-                    c["y"] = random.randint(20, HEIGHT//2)
+                    c["x"] = WIDTH + self.rng.randint(20, 200)
+                    c["y"] = self.rng.randint(20, HEIGHT//2)
+                    layer["strip"] = None
+    def _bake(self, layer, fused):
+        clouds = tuple((c["recipe"], int(c["x"]), int(c["y"])) for c in layer["clouds"])
+        strip = ASSETS.get('sky_strip', clouds, fused)
+        if not fused:
+            # RLE: las zonas transparentes entre nubes se saltan casi gratis al blitear
+            strip.set_alpha(255, pygame.RLEACCEL)
+        layer["strip"] = strip
+        layer["strip_pos"] = sky_strip_origin(clouds, fused)
+        layer["offset"] = 0.0
+        self.bakes += 1
+    def _layer_blit(self, i):
+        layer = self.layers[i]
+        fused = i == 0
+        strip = layer["strip"]
+        if strip is not None and fused and layer["strip_pos"][0] + math.floor(layer["offset"]) + strip.get_width() < WIDTH:
+            strip = None
+        if strip is None:
+            self._bake(layer, fused)
+        x0, y0 = layer["strip_pos"]
+        return layer["strip"], (x0 + math.floor(layer["offset"]), y0)
+    def background(self):
+        """Tira opaca de fondo (degradado + capa lenta) y su posición."""
+        return self._layer_blit(0)
+    def blit_sequence(self):
+        """Tiras de las capas de nubes restantes como pares (superficie, posición) para Surface.blits."""
+        return [self._layer_blit(i) for i in range(1, len(self.layers))]
     def draw(self, surf):
-        surf.blit(self.bg, (0, 0))
-        for layer in self.layers:
-            for c in layer["clouds"]:
-                surf.blit(c["surf"], (int(c["x"]), int(c["y"])) )
+        surf.blit(*self.background())
+        surf.blits(self.blit_sequence(), doreturn=False)
+
+# ------------------------------
+# Render por lotes
+# ------------------------------
+class Renderer:
+    """Junta los blits del frame en una secuencia (imagen, posición) y la envía con un solo
+    Surface.fblits (pygame-ce) o Surface.blits, en el orden de las capas.
+
+    El desplazamiento del temblor de pantalla se aplica al recoger cada capa y lo que queda
+    fuera de la pantalla no se envía. `last` guarda las cifras del último frame: `items` es
+    lo que antes costaba un blit por elemento y `draw_calls` lo que cuesta ahora.
+
+    Con dirty=True solo se redibuja (fondo + elementos) dentro de los rectángulos que han
+    cambiado respecto al frame anterior y se presenta con display.update(rects). Lo que se
+    dibuja directamente encima después de end() (HUD, textos...) debe pasarse a mark() para
+    que se restaure y se presente. Si el área sucia supera `dirty_threshold` (fracción de la
+    pantalla) se vuelve automáticamente a redibujar todo y hacer flip().
+    """
+    def __init__(self, surf, dirty=False, dirty_threshold=0.45):
+        self.surf = surf
+        self._submit = surf.fblits if hasattr(surf, 'fblits') else (lambda seq: surf.blits(seq, doreturn=False))
+        self.dirty = dirty
+        self.dirty_threshold = dirty_threshold
+        self.background = None
+        self.background_pos = (0, 0)
+        self.prev_background = (None, (0, 0))
+        self.seq = []
+        self.items = 0
+        self.culled = 0
+        self.draw_calls = 0
+        self.full = True
+        self.prev_keys = None
+        self.rects = []
+        self.overlay = []
+        self.prev_overlay = []
+        self.invalid = []
+        self.dirty_area = 1.0
+        self.last = {'items': 0, 'draw_calls': 0, 'culled': 0, 'full': True, 'dirty_rects': 0, 'dirty_area': 1.0}
+
+    def begin(self, background, pos=(0, 0)):
+        self.seq = []
+        self.items = self.culled = self.draw_calls = 0
+        self.prev_background = (self.background, self.background_pos)
+        self.background = background
+        self.background_pos = pos
+        self.prev_overlay, self.overlay = self.overlay, []
+        self.invalid = []
+        if not self.dirty:
+            self.blit(background, pos)
+
+    def blit(self, image, pos):
+        """Blit inmediato; vacía antes lo pendiente para respetar el orden."""
+        self.flush()
+        self.surf.blit(image, pos)
+        self.items += 1
+        self.draw_calls += 1
+
+    def extend(self, seq):
+        self.seq.extend(seq)
+        self.items += len(seq)
+
+    def add_sprites(self, group, ox=0, oy=0, alpha=None):
+        """Añade los sprites visibles del grupo; con `alpha` se dibujan interpolados (ver Body)."""
+        w, h = self.surf.get_size()
+        append = self.seq.append
+        n = 0
+        for spr in group:
+            r = spr.rect
+            if alpha is None:
+                x = r.x + ox
+                y = r.y + oy
+            else:
+                x = round(spr.px + (spr.x - spr.px) * alpha) + ox
+                y = round(spr.py + (spr.y - spr.py) * alpha) + oy
+            n += 1
+            if x >= w or y >= h or x + r.width <= 0 or y + r.height <= 0:
+                self.culled += 1
+                continue
+            append((spr.image, (x, y)))
+        self.items += n
+
+    def flush(self):
+        if self.seq:
+            self._submit(self.seq)
+            self.draw_calls += 1
+            self.seq = []
+
+    def mark(self, rect):
+        """Registra una zona dibujada fuera del lote (HUD, textos...). Devuelve el rect."""
+        if rect:
+            self.overlay.append(pygame.Rect(rect))
+        return rect
+
+    def invalidate(self, rect):
+        """Fuerza a redibujar una zona en este frame (un elemento que ha cambiado sin cambiar de superficie ni de posición)."""
+        self.invalid.append(pygame.Rect(rect))
+
+    def _dirty_rects(self, keys):
+        screen = self.surf.get_rect()
+        changed = keys.symmetric_difference(self.prev_keys)
+        rects = [pygame.Rect(pos, image.get_size()).clip(screen) for image, pos in changed]
+        rects.extend(r.clip(screen) for r in self.prev_overlay)
+        rects.extend(r.clip(screen) for r in self.invalid)
+        # une los que se solapan para no redibujar dos veces la misma zona
+        merged = []
+        for r in rects:
+            if not r.width or not r.height:
+                continue
+            i = r.collidelist(merged)
+            while i != -1:
+                r = r.union(merged.pop(i))
+                i = r.collidelist(merged)
+            merged.append(r)
+        return merged
+
+    def end(self):
+        if not self.dirty:
+            self.flush()
+            self.full = True
+            self.dirty_area = 1.0
+        else:
+            seq, self.seq = self.seq, []
+            keys = set(seq)
+            # si el fondo se ha desplazado cambia toda la pantalla
+            same_bg = self.prev_background == (self.background, self.background_pos)
+            rects = self._dirty_rects(keys) if self.prev_keys is not None and same_bg else None
+            area = 1.0
+            if rects is not None:
+                area = sum(r.width*r.height for r in rects) / (self.surf.get_width()*self.surf.get_height())
+            self.full = rects is None or area > self.dirty_threshold
+            if self.full:
+                self.surf.blit(self.background, self.background_pos)
+                self._submit(seq)
+                self.draw_calls += 2
+                self.rects = []
+            else:
+                item_rects = [pygame.Rect(pos, image.get_size()) for image, pos in seq]
+                bx, by = self.background_pos
+                for r in rects:
+                    self.surf.set_clip(r)
+                    self.surf.blit(self.background, r, r.move(-bx, -by))
+                    hit = r.collidelistall(item_rects)
+                    if hit:
+                        self._submit([seq[i] for i in hit])
+                    self.draw_calls += 2
+                self.surf.set_clip(None)
+                self.rects = rects
+            self.prev_keys = keys
+            self.dirty_area = area
+        self.last = {'items': self.items, 'draw_calls': self.draw_calls, 'culled': self.culled,
+                     'full': self.full, 'dirty_rects': len(self.rects), 'dirty_area': self.dirty_area}
+
+    def present(self):
+        if self.full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.rects + self.overlay)
+
+
+# ------------------------------
+# HUD
+# ------------------------------
+class Hud:
+    """HUD en modo retenido, compuesto sobre su propia superficie.
+
+    Cada widget se describe con una tupla de primitivas, ('text', fuente, texto, color, pos)
+    o ('rect', color, rect, radio), que hace a la vez de clave: update() solo repinta las zonas
+    de los widgets cuya tupla ha cambiado (y lo que se solape con ellas, en orden). draw()
+    copia a la pantalla solo los rects de los widgets visibles.
+    """
+    def __init__(self, size):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.widgets = {}   # nombre -> primitivas, en orden de dibujado
+        self.rects = {}     # nombre -> rect que ocupa
+        self.areas = []     # rects de los widgets, unidos los que se solapan
+        self.repaints = 0
+
+    @staticmethod
+    def _prim_rects(prims):
+        rects = []
+        for p in prims:
+            if p[0] == 'text':
+                _, font, text, color, pos = p
+                rects.append(pygame.Rect(pos, render_text(font, text, color).get_size()))
+            else:
+                rects.append(pygame.Rect(p[2]))
+        return rects
+
+    def _bounds(self, prims):
+        rects = self._prim_rects(prims)
+        return rects[0].unionall(rects[1:])
+
+    def _paint(self, prims):
+        surf = self.surface
+        for p in prims:
+            if p[0] == 'text':
+                _, font, text, color, pos = p
+                surf.blit(render_text(font, text, color), pos)
+            else:
+                _, color, rect, radius = p
+                pygame.draw.rect(surf, color, rect, border_radius=radius)
+
+    def update(self, widgets):
+        """`widgets`: dict nombre -> primitivas (None u omitido: oculto), en orden de dibujado."""
+        widgets = {name: prims for name, prims in widgets.items() if prims}
+        if widgets == self.widgets:
+            return
+        damage = []
+        for name in set(self.widgets) | set(widgets):
+            if self.widgets.get(name) != widgets.get(name):
+                if name in self.rects:
+                    damage.append(self.rects[name])
+                if name in widgets:
+                    damage.append(self._bounds(widgets[name]))
+        self.widgets = widgets
+        self.rects = {name: self._bounds(prims) for name, prims in widgets.items()}
+        surf = self.surface
+        for area in damage:
+            surf.set_clip(area)
+            surf.fill((0, 0, 0, 0))
+            for name, prims in widgets.items():
+                if self.rects[name].colliderect(area):
+                    self._paint(prims)
+        surf.set_clip(None)
+        # se vuelca primitiva a primitiva (no el rect de todo el widget: el texto central
+        # ocuparía media pantalla), pero cada píxel una sola vez: dos se notaría en los bordes
+        areas = []
+        for r in itertools.chain.from_iterable(map(self._prim_rects, widgets.values())):
+            i = r.collidelist(areas)
+            while i != -1:
+                r = r.union(areas.pop(i))
+                i = r.collidelist(areas)
+            areas.append(r)
+        self.areas = areas
+        self.repaints += 1
+
+    def draw(self, surf):
+        """Vuelca los widgets visibles; devuelve las zonas copiadas (para Renderer.mark)."""
+        surf.blits([(self.surface, r.topleft, r) for r in self.areas], doreturn=False)
+        return self.areas
+
+
+# ------------------------------
+# Fase amplia de colisiones
+# ------------------------------
+class SpatialGrid:
+    """Rejilla uniforme sobre los sprites de un grupo para las pruebas de colisión.
+
+    sync() se llama una vez por frame: recorre el grupo y solo toca los cubos de los sprites
+    que han cambiado de celda (una bala rápida cambia de celda solo cada pocos frames). collide() da exactamente lo mismo que pygame.sprite.spritecollide
+    (mismos sprites, en el orden del grupo, y respetando los que ya se han matado en esta
+    pasada), pero probando solo los candidatos de las celdas que toca el rect.
+    """
+    def __init__(self, group, cell=64):
+        self.group = group
+        self.cell = cell
+        self.cells = {}      # (cx, cy) -> set de sprites
+        self.spans = {}      # sprite -> (cx0, cy0, cx1, cy1) de las celdas que ocupa
+        self.order = {}      # sprite -> posición en el grupo en el último sync()
+        self.moves = 0
+
+    def _span(self, r):
+        if not r.width or not r.height:
+            return None   # colliderect nunca da positivo con rects vacíos
+        c = self.cell
+        return (r.x // c, r.y // c, (r.right - 1) // c, (r.bottom - 1) // c)
+
+    def _insert(self, spr, span):
+        cells = self.cells
+        x0, y0, x1, y1 = span
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = {spr}
+                else:
+                    bucket.add(spr)
+
+    def _remove(self, spr, span):
+        cells = self.cells
+        x0, y0, x1, y1 = span
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells[(cx, cy)]
+                bucket.discard(spr)
+                if not bucket:
+                    del cells[(cx, cy)]
+
+    def sync(self):
+        spans = self.spans
+        order = {}
+        span_of = self._span
+        for i, spr in enumerate(self.group):
+            order[spr] = i
+            span = span_of(spr.rect)
+            old = spans.get(spr)
+            if old == span:
+                continue
+            if old is not None:
+                self._remove(spr, old)
+            if span is None:
+                spans.pop(spr, None)
+            else:
+                self._insert(spr, span)
+                spans[spr] = span
+            self.moves += 1
+        if len(spans) > len(order):
+            for spr in [s for s in spans if s not in order]:
+                self._remove(spr, spans.pop(spr))
+        self.order = order
+
+    def candidates(self, rect):
+        span = self._span(rect)
+        if span is None or not self.cells:
+            return ()
+        x0, y0, x1, y1 = span
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), ())
+        found = set()
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def collide(self, rect, dokill=False):
+        """Equivalente a spritecollide(sprite, group, dokill) para un sprite con este rect."""
+        hit = rect.colliderect
+        members = self.group.spritedict
+        found = [s for s in self.candidates(rect) if s in members and hit(s.rect)]
+        if len(found) > 1:
+            found.sort(key=self.order.__getitem__)
+        if dokill:
+            for s in found:
+                s.kill()
+        return found
+
+
+# ------------------------------
+# Perfilado por fases
+# ------------------------------
+def percentile(values, p):
+    """Percentil por rango más cercano (0 si no hay datos)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class FrameProfiler:
+    """Tiempos de cada fase del frame, en ms.
+
+    El bucle llama a begin() al empezar el frame, lap(fase) al terminar cada fase (el tiempo
+    desde el lap anterior se suma a esa fase, así que una fase que se repite, como las de la
+    simulación cuando caen varios ticks en un frame, se acumula) y end() al final.
+    Cada fase guarda los últimos `size` frames en un buffer circular (para el overlay) y un
+    histograma de toda la sesión con los límites de EDGES_MS (para export()).
+    `total` es el trabajo del frame y `interval` el tiempo entre frames que da el reloj,
+    espera incluida. Desactivado, lap() vuelve nada más entrar.
+    """
+    PHASES = ('events', 'audio', 'player', 'bullets', 'particles', 'enemies', 'collisions',
+              'sky', 'sprites', 'hud', 'overlay', 'flip')
+    SERIES = PHASES + ('total', 'interval')
+    EDGES_MS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 66.7)
+
+    def __init__(self, enabled=True, size=600):
+        self.enabled = enabled
+        self.size = size
+        self.rings = {name: collections.deque(maxlen=size) for name in self.SERIES}
+        self.hist = {name: [0] * (len(self.EDGES_MS) + 1) for name in self.SERIES}
+        self.sums = dict.fromkeys(self.SERIES, 0.0)
+        self.maxs = dict.fromkeys(self.SERIES, 0.0)
+        self.frames = 0
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.interval = 0.0
+        self.start = self.last = 0.0
+
+    def begin(self, interval_ms):
+        if not self.enabled:
+            return
+        self.interval = interval_ms
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end(self):
+        if not self.enabled:
+            return
+        for phase, secs in self.current.items():
+            self._record(phase, secs * 1000)
+        self._record('total', (self.last - self.start) * 1000)
+        self._record('interval', self.interval)
+        self.frames += 1
+
+    def _record(self, name, ms):
+        self.rings[name].append(ms)
+        self.hist[name][bisect.bisect_left(self.EDGES_MS, ms)] += 1
+        self.sums[name] += ms
+        if ms > self.maxs[name]:
+            self.maxs[name] = ms
+
+    def summary(self):
+        """Por serie: media y máximo de la sesión, p50/p99 de la ventana reciente e histograma."""
+        n = self.frames or 1
+        return {name: {'mean_ms': self.sums[name] / n,
+                       'max_ms': self.maxs[name],
+                       'p50_ms': percentile(self.rings[name], 50),
+                       'p99_ms': percentile(self.rings[name], 99),
+                       'histogram': list(self.hist[name])}
+                for name in self.SERIES}
+
+    def export(self, path):
+        """Guarda summary() en JSON o, si la ruta acaba en .csv, una fila por fase."""
+        summary = self.summary()
+        if path.lower().endswith('.csv'):
+            buckets = [f"<={e}" for e in self.EDGES_MS] + [f">{self.EDGES_MS[-1]}"]
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                w = csv.writer(f)
+                w.writerow(['phase', 'frames', 'mean_ms', 'max_ms', 'p50_ms', 'p99_ms'] + buckets)
+                for name, st in summary.items():
+                    w.writerow([name, self.frames] + [f"{st[k]:.4f}" for k in ('mean_ms', 'max_ms', 'p50_ms', 'p99_ms')]
+                               + st['histogram'])
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'frames': self.frames, 'window': self.size, 'edges_ms': list(self.EDGES_MS),
+                           'phases': summary}, f, indent=2)
+
 
 # ------------------------------
 # Juego principal
 # ------------------------------
 class Game:
-    def __init__(self, screen):
+    # Un RNG por subsistema: oleadas, disparo enemigo, power-ups, explosiones y temblor de
+    # pantalla (este último por frame, no por tick; no influye en la partida)
+    RNG_STREAMS = ('waves', 'fire', 'drops', 'fx', 'shake')
+
+    def __init__(self, screen, dirty_rects=False, composite_formation=True, fps=FPS, sim_hz=SIM_HZ, seed=None,
+                 difficulty=None):
+        # Métrica de arranque: segundos desde aquí hasta el primer display.flip()
+        self.boot_time = time.perf_counter()
+        self.time_to_first_frame = None
         self.screen = screen
+        # Sin pantalla (screen=None) el juego es solo simulación: ni cielo, ni dibujado, ni audio;
+        # se maneja con step() (ver headless.py)
+        self.headless = screen is None
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont("arial", 22)
-        self.bigfont = pygame.font.SysFont("arial", 44, bold=True)
-
-        self.sky = Sky()
+        if self.headless:
+            self.font = self.bigfont = self.sky = self.renderer = self.hud = None
+        else:
+            self.font = ASSETS.get('font')
+            self.bigfont = ASSETS.get('bigfont')
+            self.sky = Sky()
+            self.renderer = Renderer(screen, dirty=dirty_rects)
+            self.hud = Hud(screen.get_size())
+        # la oleada se dibuja con un solo blit (Formation); False: un blit por enemigo
+        self.composite_formation = composite_formation
+        # Bucle de paso fijo: la simulación avanza en ticks de 1/sim_hz s pase lo que pase con
+        # los FPS; el tiempo real que sobra se acumula y se usa para interpolar el dibujado.
+        self.fps = fps
+        self.sim_hz = sim_hz
+        self.tick_dt = 1.0 / sim_hz
+        self.accumulator = 0.0
+        self.sky_time = 0.0   # tiempo de cielo pendiente de aplicar (modo dirty, ver frame)
+        self.ticks = 0
+        self.queued = ()   # pulsaciones (PULSES) que llegaron en un step() sin ticks
+        # Misma semilla + mismas Actions por tick = misma partida (ver InputRecorder)
+        self.rng = {name: random.Random() for name in self.RNG_STREAMS}
+        self.reseed(random.randrange(2**32) if seed is None else seed)
+        self.recorder = None
+        self.replay = None
+        self.difficulty = difficulty or Difficulty()
+        # Tiempos por fase de cada frame; F3 muestra el overlay (ver draw_profiler)
+        self.profiler = FrameProfiler(enabled=not self.headless)
+        self.show_profiler = False
+        self.profiler_font = None
+        self.profiler_panel = None
+        self.profiler_panel_time = 0.0
 
         self.player = Player()
         self.player_group = pygame.sprite.GroupSingle(self.player)
         self.enemy_group = pygame.sprite.Group()
         self.boss_group = pygame.sprite.GroupSingle()
         self.bullets = pygame.sprite.Group()
-        self.enemy_bullets = pygame.sprite.Group()
-        self.particles = pygame.sprite.Group()
+        self.enemy_bullets = BulletField()
+        self.particles = ParticleSystem(rng=self.rng['fx'])
         self.powerups = pygame.sprite.Group()
+        self.bullet_grid = SpatialGrid(self.bullets)
+        self.powerup_grid = SpatialGrid(self.powerups)
+        self.formation = Formation()
 
         self.state = "menu"   # menu, playing, paused, gameover
         self.score = 0
         self.level = 1
         self.world_time = 0.0
+        self.last_hit = None   # causa de la última vida perdida: "enemy", "boss" (su bala) o "invasion"
         self.shake_timer = 0.0
 
         self.enemy_dir = 1
@@ -506,19 +1860,27 @@ class Game:
         self.anim_frame = 0
         self.anim_timer = 0.0
 
-        self.audio = Audio()
+        self.audio = Audio(enabled=not self.headless)
 
         self.spawn_wave(self.level)
 
+    def reseed(self, seed):
+        """Reinicia todos los RNG de la partida a partir de `seed`."""
+        self.seed = seed
+        for name, rng in self.rng.items():
+            rng.seed(f"{seed}:{name}")
+
     def spawn_wave(self, level):
         self.enemy_group.empty()
         self.boss_group.empty()
+        self.formation = Formation()
         if level % 3 == 0:
             # Jefe
-            boss = Boss((WIDTH//2, 140), level)
+            boss = Boss((WIDTH//2, 140), level, self.difficulty)
             self.boss_group.add(boss)
             if self.audio.enabled:
                 self.audio.sfx_play('boss_roar')
+                self.audio.set_music_mood(bpm=150, intensity=1.3)
             # Ajustar enemigos normales: ninguno en esta oleada
             self.enemy_speed = 0
             self.enemy_fire_cool = 1.0
@@ -539,42 +1901,27 @@ class Game:
                 x = start_x + c * margin_x
                 y = start_y + r * margin_y
                 color = palette[r % len(palette)]
-                enemy = Enemy((x, y), color, frame=random.randint(0,1))
+                enemy = Enemy((x, y), color, frame=self.rng['waves'].randint(0,1))
+                self.formation.add(enemy, c)
                 self.enemy_group.add(enemy)
         self.enemy_dir = 1
-        self.enemy_speed = 40 + 12 * (level-1)
-        self.enemy_descend = 18 + 2 * (level-1)
-        self.enemy_fire_cool = max(0.6, 1.4 - 0.08 * (level-1))
+        self.enemy_speed, self.enemy_descend, self.enemy_fire_cool = self.difficulty.wave(level)
         self.enemy_fire_timer = 0.0
+        if self.audio.enabled:
+            self.audio.set_music_mood(bpm=min(146, 132 + 2*(level-1)), intensity=1.0)
 
     def add_explosion(self, pos, base_color):
-        for _ in range(16):
-            angle = random.uniform(0, 2*math.pi)
-            speed = random.uniform(120, 320)
-            vx = math.cos(angle)*speed
-            vy = math.sin(angle)*speed
-            color = (
-                min(255, int(base_color[0] + random.randint(-20, 20))),
-                min(255, int(base_color[1] + random.randint(-20, 20))),
-                min(255, int(base_color[2] + random.randint(-20, 20))),
-            )
-            self.particles.add(Particle(pos, color, (vx, vy), lifetime=random.uniform(0.35, 0.8)))
+        self.particles.emit(pos, base_color, 16)
         self.shake_timer = 0.15
         if self.audio.enabled:
             self.audio.sfx_play('explosion')
 
     def enemy_fire(self):
         # enemigo aleatorio de la fila más baja por columna
-        columns = {}
-        for e in self.enemy_group:
-            col = round(e.rect.x / 70)
-            if col not in columns or e.rect.y > columns[col].rect.y:
-                columns[col] = e
-        shooters = list(columns.values())
+        shooters = self.formation.shooters(70)
         if shooters:
-            e = random.choice(shooters)
-            bullet = Bullet(e.rect.centerx, e.rect.bottom+6, dy=260, color=(255, 140, 140), owner="enemy")
-            self.enemy_bullets.add(bullet)
+            e = self.rng['fire'].choice(shooters)
+            self.enemy_bullets.spawn(e.rect.centerx, e.rect.bottom+6, 0, 260, (255, 140, 140))
 
     def boss_fire(self, boss):
         # Dos patrones: abanico y ráfaga dirigida
@@ -582,19 +1929,10 @@ class Game:
             # abanico
             for ang in range(-45, 46, 15):
                 a = math.radians(90 + ang)
-                vx = 220 * math.cos(a)
-                vy = 220 * math.sin(a)
-                b = Bullet(boss.rect.centerx, boss.rect.bottom-10, dy=0, color=(255, 120, 180), owner="enemy")
-                # reutilizamos Bullet, pero le damos velocidad con vx via rect update manual
-                b.vx = vx
-                b.vy = vy
-                def upd(selfb, dt, _orig=Bullet.update):
-                    selfb.rect.x += int(selfb.vx * dt)
-                    selfb.rect.y += int(selfb.vy * dt)
-                    if selfb.rect.bottom < 0 or selfb.rect.top > HEIGHT or selfb.rect.right < 0 or selfb.rect.left > WIDTH:
-                        selfb.kill()
-                b.update = upd.__get__(b, Bullet)
-                self.enemy_bullets.add(b)
+                speed = 220 * self.difficulty.boss_shot_speed
+                vx = speed * math.cos(a)
+                vy = speed * math.sin(a)
+                self.enemy_bullets.spawn(boss.rect.centerx, boss.rect.bottom-10, vx, vy, (255, 120, 180), owner="boss")
         else:
             # ráfagas dirigidas al jugador
             if self.player.alive:
@@ -603,53 +1941,52 @@ class Game:
                     dx = px - boss.rect.centerx
                     dy = py - boss.rect.centery
                     ang = math.atan2(dy, dx)
-                    speed = 300 + i*40
+                    speed = (300 + i*40) * self.difficulty.boss_shot_speed
                     vx = math.cos(ang)*speed
                     vy = math.sin(ang)*speed
-                    b = Bullet(boss.rect.centerx, boss.rect.centery+20, dy=0, color=(255, 180, 120), owner="enemy")
-                    b.vx, b.vy = vx, vy
-                    def upd(selfb, dt, _orig=Bullet.update):
-                        selfb.rect.x += int(selfb.vx * dt)
-                        selfb.rect.y += int(selfb.vy * dt)
-                        if selfb.rect.bottom < 0 or selfb.rect.top > HEIGHT or selfb.rect.right < 0 or selfb.rect.left > WIDTH:
-                            selfb.kill()
-                    b.update = upd.__get__(b, Bullet)
-                    self.enemy_bullets.add(b)
+                    self.enemy_bullets.spawn(boss.rect.centerx, boss.rect.centery+20, vx, vy, (255, 180, 120), owner="boss")
 
     def handle_collisions(self, dt):
-        # Balas del jugador contra enemigos
-        hits = pygame.sprite.groupcollide(self.enemy_group, self.bullets, dokilla=False, dokillb=True)
-        for enemy, bullets in hits.items():
+        self.bullet_grid.sync()
+
+        drops = self.rng['drops']
+        fx = self.rng['fx']
+        # Balas del jugador contra enemigos (mismo resultado y orden que groupcollide)
+        collide = self.bullet_grid.collide
+        for enemy in self.enemy_group.sprites():
+            if not collide(enemy.rect, dokill=True):
+                continue
             self.add_explosion(enemy.rect.center, enemy.color)
             enemy.kill()
             self.score += 10
-            if random.random() < 0.12:
-                self.powerups.add(PowerUp(enemy.rect.center))
+            if drops.random() < 0.12:
+                self.powerups.add(PowerUp.acquire(enemy.rect.center, kind=drops.choice(PowerUp.TYPES)))
 
         # Balas jugador contra BOSS
         if self.boss_group:
             boss = self.boss_group.sprite
             if boss:
-                collisions = pygame.sprite.spritecollide(boss, self.bullets, dokill=True)
+                collisions = self.bullet_grid.collide(boss.rect, dokill=True)
                 for _ in collisions:
                     boss.hp -= 5
-                    self.add_explosion((boss.rect.centerx + random.randint(-20,20), boss.rect.centery+random.randint(-20,20)), (250, 160, 250))
+                    self.add_explosion((boss.rect.centerx + fx.randint(-20,20), boss.rect.centery+fx.randint(-20,20)), (250, 160, 250))
                     self.score += 2
                 if boss and boss.hp <= 0:
                     self.add_explosion(boss.rect.center, (250, 160, 250))
                     self.score += 300
                     boss.kill()
-                    if random.random() < 0.8:
-                        self.powerups.add(PowerUp((WIDTH//2, 260), kind=random.choice(['rapid','shield'])))
+                    if drops.random() < 0.8:
+                        self.powerups.add(PowerUp.acquire((WIDTH//2, 260), kind=drops.choice(['rapid','shield'])))
 
         # Balas enemigas contra jugador
         if self.player.alive:
-            phit = pygame.sprite.spritecollide(self.player, self.enemy_bullets, dokill=True)
+            phit = self.enemy_bullets.collide(self.player.rect)
             if phit:
                 if self.player.shield_timer > 0:
                     self.add_explosion((self.player.rect.centerx, self.player.rect.top), (150, 210, 255))
                 else:
                     self.player.lives -= 1
+                    self.last_hit = phit[0]
                     if self.audio.enabled:
                         self.audio.sfx_play('hit')
                     self.add_explosion(self.player.rect.center, (255, 200, 160))
@@ -658,16 +1995,17 @@ class Game:
                         self.state = "gameover"
 
         # Enemigos que llegan al suelo
-        for e in list(self.enemy_group):
-            if e.rect.bottom >= self.player.rect.top - 10:
-                self.player.lives = 0
-                self.player.alive = False
-                self.state = "gameover"
-                break
+        if self.formation and self.formation.bottom() >= self.player.rect.top - 10:
+            self.last_hit = "invasion"
+            self.player.lives = 0
+            self.player.alive = False
+            self.state = "gameover"
 
         # Player con powerups
         if self.player.alive:
-            got = pygame.sprite.spritecollide(self.player, self.powerups, dokill=True)
+            # se sincroniza aquí para incluir los power-ups que acaban de soltar los enemigos
+            self.powerup_grid.sync()
+            got = self.powerup_grid.collide(self.player.rect, dokill=True)
             for p in got:
                 if p.kind == "rapid":
                     self.player.rapid_timer = 8.0
@@ -700,8 +2038,8 @@ class Game:
 
         move_x = self.enemy_speed * self.enemy_dir * dt
         shift_down = False
-        min_x = min(e.rect.left for e in self.enemy_group)
-        max_x = max(e.rect.right for e in self.enemy_group)
+        min_x = self.formation.left()
+        max_x = self.formation.right()
 
         if max_x + move_x >= WIDTH - 20:
             self.enemy_dir = -1
@@ -710,10 +2048,7 @@ class Game:
             self.enemy_dir = 1
             shift_down = True
 
-        for e in self.enemy_group:
-            e.rect.x += int(self.enemy_speed * self.enemy_dir * dt)
-            if shift_down:
-                e.rect.y += self.enemy_descend
+        self.formation.move(self.enemy_speed * self.enemy_dir * dt, self.enemy_descend if shift_down else 0)
 
         self.anim_timer += dt
         if self.anim_timer >= 0.35:
@@ -721,167 +2056,358 @@ class Game:
             self.anim_frame = 1 - self.anim_frame
             for e in self.enemy_group:
                 e.animate(self.anim_frame)
+            self.formation.animate(self.anim_frame)
 
         self.enemy_fire_timer -= dt
         if self.enemy_fire_timer <= 0:
             self.enemy_fire()
             self.enemy_fire_timer = self.enemy_fire_cool
 
-    def draw_hud(self, surf):
-        lives_surf = self.font.render(f"Vidas: {self.player.lives}", True, HUD_COLOR)
-        score_surf = self.font.render(f"Puntos: {self.score}", True, HUD_COLOR)
-        lvl_surf = self.font.render(f"Oleada: {self.level}", True, HUD_COLOR)
-        surf.blit(lives_surf, (16, 10))
-        surf.blit(score_surf, (16, 36))
-        surf.blit(lvl_surf, (16, 62))
+    def step(self, dt, actions):
+        """Avanza `dt` segundos de juego con `actions` (Actions) mantenidas todo el intervalo.
+
+        La simulación va en ticks fijos de tick_dt; lo que no llega a un tick queda acumulado
+        para el siguiente step(). Las pulsaciones (PULSES: shoot, pause, restart) solo cuentan
+        en el primer tick (y si en este step no cabe ninguno, se guardan para el siguiente).
+        Devuelve cuántos ticks se han simulado.
+        """
+        if self.queued:
+            actions = actions._replace(**dict.fromkeys(self.queued, True))
+            self.queued = ()
+        self.accumulator += dt
+        n = 0
+        while self.accumulator >= self.tick_dt:
+            if self.replay is not None and self.replay.done:
+                break
+            self.simulate(self.tick_dt, actions)
+            self.accumulator -= self.tick_dt
+            if n == 0:
+                actions = actions._replace(shoot=False, pause=False, restart=False)
+            n += 1
+        self.queued = tuple(name for name in PULSES if getattr(actions, name))
+        return n
+
+    def simulate(self, dt, actions):
+        """Un tick de simulación de `dt` segundos (siempre el mismo, ver tick_dt).
+
+        Con una grabación en `replay` las Actions salen de ella y no de `actions`; con
+        `recorder` las de cada tick quedan anotadas.
+        """
+        if self.replay is not None:
+            actions = self.replay.next() or Actions()
+        if self.recorder is not None:
+            self.recorder.record(actions)
+        self.ticks += 1
+        if actions.restart and self.state in ("menu", "gameover"):
+            self.reset()
+        elif actions.pause and self.state in ("playing", "paused"):
+            self.toggle_pause()
+        lap = self.profiler.lap
+        if self.state == "playing":
+            self.player.update(dt, actions)
+            if actions.shoot or (actions.fire and self.player.rapid_timer > 0):
+                self.player.shoot(self.bullets, audio=self.audio)
+            lap('player')
+            self.bullets.update(dt)
+            self.enemy_bullets.update(dt)
+            self.powerups.update(dt)
+            lap('bullets')
+            self.particles.update(dt)
+            lap('particles')
+            self.update_enemies(dt)
+            lap('enemies')
+            self.handle_collisions(dt)
+            lap('collisions')
+        else:
+            self.particles.update(dt*0.6)
+            self.powerups.update(dt*0.6)
+            lap('particles')
+        if self.shake_timer > 0:
+            self.shake_timer -= dt
+
+    def allocation_stats(self):
+        """Entidades y superficies creadas hasta ahora; en régimen estable no deberían crecer."""
+        stats = {}
+        for cls in (Bullet, PowerUp):
+            name = cls.__name__.lower()
+            stats[name + '_created'] = cls.pool.created
+            stats[name + '_reused'] = cls.pool.reused
+        stats['surfaces_built'] = sum(ASSETS.builds[f] for f in ('enemy', 'boss', 'bullet', 'powerup', 'particle'))
+        stats['particle_buffer_grows'] = self.particles.grows
+        stats['enemy_bullet_buffer_grows'] = self.enemy_bullets.grows
+        return stats
+
+    def draw_hud(self, surf, center=None):
+        """HUD (y, con `center`, el texto central del menú/pausa/game over) a través de la
+        capa Hud: solo se repinta lo que cambia. Los temporizadores cambian de texto cada
+        0.1 s, que es lo que se muestra, no cada frame."""
+        font = self.font
+        widgets = {
+            'lives': (('text', font, f"Vidas: {self.player.lives}", HUD_COLOR, (16, 10)),),
+            'score': (('text', font, f"Puntos: {self.score}", HUD_COLOR, (16, 36)),),
+            'level': (('text', font, f"Oleada: {self.level}", HUD_COLOR, (16, 62)),),
+        }
         if self.player.rapid_timer > 0:
-            t = self.font.render(f"Ráfaga: {self.player.rapid_timer:0.1f}s", True, (160, 255, 190))
-            surf.blit(t, (WIDTH-200, 10))
+            widgets['rapid'] = (('text', font, f"Ráfaga: {self.player.rapid_timer:0.1f}s", (160, 255, 190), (WIDTH-200, 10)),)
         if self.player.shield_timer > 0:
-            t = self.font.render(f"Escudo: {self.player.shield_timer:0.1f}s", True, (180, 220, 255))
-            surf.blit(t, (WIDTH-200, 36))
+            widgets['shield'] = (('text', font, f"Escudo: {self.player.shield_timer:0.1f}s", (180, 220, 255), (WIDTH-200, 36)),)
         # barra de vida del boss
-        if self.boss_group:
-            boss = self.boss_group.sprite
-            if boss:
-                bar_w = WIDTH - 200
-                bar_h = 18
-                x = 100
-                y = 18
-                pygame.draw.rect(surf, (60, 30, 80), (x, y, bar_w, bar_h), border_radius=6)
-                pct = max(0.0, min(1.0, boss.hp / boss.max_hp))
-                pygame.draw.rect(surf, (220, 120, 240), (x, y, int(bar_w*pct), bar_h), border_radius=6)
-                lbl = self.font.render("Jefe", True, (255, 230, 255))
-                surf.blit(lbl, (x+4, y-4))
-
-    def draw_center_text(self, lines, small=False):
-        total_h = 0
-        rendered = []
-        for i, (txt, color) in enumerate(lines):
-            f = self.font if small else self.bigfont
-            s = f.render(txt, True, color)
-            rendered.append(s)
-            total_h += s.get_height() + (10 if not small else 6)
-        y = HEIGHT//2 - total_h//2
-        for s in rendered:
-            self.screen.blit(s, s.get_rect(center=(WIDTH//2, y + s.get_height()//2)))
-            y += s.get_height() + (10 if not small else 6)
+        boss = self.boss_group.sprite
+        if boss:
+            bar_w = WIDTH - 200
+            bar_h = 18
+            x = 100
+            y = 18
+            pct = max(0.0, min(1.0, boss.hp / boss.max_hp))
+            widgets['boss'] = (('rect', (60, 30, 80), (x, y, bar_w, bar_h), 6),
+                               ('rect', (220, 120, 240), (x, y, int(bar_w*pct), bar_h), 6),
+                               ('text', font, "Jefe", (255, 230, 255), (x+4, y-4)))
+        if center:
+            widgets['center'] = self.center_text(*center)
+        self.hud.update(widgets)
+        for rect in self.hud.draw(surf):
+            self.renderer.mark(rect)
+
+    def center_text(self, lines, small=False):
+        """Primitivas del Hud para `lines` [(texto, color)] centradas en pantalla."""
+        f = self.font if small else self.bigfont
+        gap = 6 if small else 10
+        sizes = [render_text(f, txt, color).get_size() for txt, color in lines]
+        y = HEIGHT//2 - sum(h + gap for _, h in sizes)//2
+        prims = []
+        for (txt, color), (w, h) in zip(lines, sizes):
+            prims.append(('text', f, txt, color, (WIDTH//2 - w//2, y)))
+            y += h + gap
+        return tuple(prims)
+
+    def draw_profiler(self, surf):
+        """Overlay de rendimiento (F3): gráfica de tiempos de frame, p50/p99 por fase y
+        entidades por grupo. El panel se rehace 4 veces por segundo y entre medias solo se
+        vuelve a pegar."""
+        prof = self.profiler
+        if self.profiler_panel is None or self.world_time - self.profiler_panel_time >= 0.25:
+            if self.profiler_font is None:
+                self.profiler_font = ASSETS.get('profiler_font')
+            font = self.profiler_font
+            rings = prof.rings
+            counts = (f"enemigos {len(self.enemy_group)}  jefe {len(self.boss_group)}  power-ups {len(self.powerups)}",
+                      f"balas {len(self.bullets)}/{len(self.enemy_bullets)}  partículas {len(self.particles)}"
+                      f"  blits {self.renderer.last['draw_calls']}")
+            # filas de columnas (nombre, p50, p99); cada columna va a una x fija
+            lines = [("ms", "p50", "p99")]
+            lines += [(name, f"{percentile(rings[name], 50):.2f}", f"{percentile(rings[name], 99):.2f}")
+                      for name in ('interval', 'total') + prof.PHASES]
+            lines += [(text,) for text in counts]
+            graph_w, graph_h = 240, 60
+            line_h = font.get_linesize()
+            panel = pygame.Surface((graph_w + 60, graph_h + 12 + line_h * len(lines) + 8), pygame.SRCALPHA)
+            panel.fill((0, 0, 0, 170))
+            # gráfica: intervalo entre frames (gris) y trabajo del frame (cian); la línea es el presupuesto
+            budget = 1000.0 / self.fps
+            scale = graph_h / (budget * 3)
+            gx, gy = 8, 6
+            for i, (interval, work) in enumerate(zip(list(rings['interval'])[-graph_w:], list(rings['total'])[-graph_w:])):
+                x = gx + i
+                color = (150, 150, 160) if interval <= budget * 1.2 else (255, 120, 90)
+                pygame.draw.line(panel, color, (x, gy + graph_h), (x, gy + graph_h - min(graph_h, int(interval * scale))))
+                pygame.draw.line(panel, (90, 220, 255), (x, gy + graph_h), (x, gy + graph_h - min(graph_h, int(work * scale))))
+            pygame.draw.line(panel, (255, 255, 180), (gx, gy + graph_h - int(budget * scale)),
+                             (gx + graph_w, gy + graph_h - int(budget * scale)))
+            y = gy + graph_h + 6
+            for row in lines:
+                for x, text in zip((gx, gx + 130, gx + 200), row):
+                    panel.blit(font.render(text, True, HUD_COLOR), (x, y))
+                y += line_h
+            self.profiler_panel = panel
+            self.profiler_panel_time = self.world_time
+        self.renderer.mark(surf.blit(self.profiler_panel, (10, HEIGHT - self.profiler_panel.get_height() - 10)))
 
     def run(self):
-        while True:
-            dt_ms = self.clock.tick(FPS)
-            dt = dt_ms / 1000.0
-            self.world_time += dt
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if self.state == "menu":
-                    if event.type == pygame.KEYDOWN and event.key in (pygame.K_RETURN, pygame.K_SPACE):
-                        self.reset()
-                        self.state = "playing"
-                elif self.state == "playing":
-                    if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
-                        self.state = "paused"
-                        if self.audio.enabled:
-                            self.audio.pause_all()
-                    if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                        self.player.shoot(self.bullets, audio=self.audio)
-                elif self.state == "paused":
-                    if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
-                        self.state = "playing"
-                        if self.audio.enabled:
-                            self.audio.resume_all()
-                elif self.state == "gameover":
-                    if event.type == pygame.KEYDOWN and event.key in (pygame.K_RETURN, pygame.K_SPACE):
-                        self.reset()
-                        self.state = "playing"
-
-            keys = pygame.key.get_pressed()
-
-            # Update
+        """Bucle principal; con una grabación en `replay`, termina cuando se acaba."""
+        while self.replay is None or not self.replay.done:
+            self.frame()
+
+    def frame(self):
+        """Un frame: eventos, los ticks de simulación que toquen según el reloj y dibujado."""
+        dt_ms = self.clock.tick(self.fps)
+        prof = self.profiler
+        prof.begin(dt_ms)
+        dt = dt_ms / 1000.0
+        self.world_time += dt
+        shoot = False
+
+        pause = restart = False
+
+        # Las teclas de juego se convierten en Actions y se aplican en el siguiente tick
+        # (simulate), así una grabación las reproduce igual
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+            elif self.state in ("menu", "gameover"):
+                if event.key in (pygame.K_RETURN, pygame.K_SPACE):
+                    restart = True
+            elif event.key == pygame.K_p:
+                pause = True
+            elif event.key == pygame.K_SPACE and self.state == "playing":
+                shoot = True
+
+        keys = pygame.key.get_pressed()
+        prof.lap('events')
+
+        # Update
+        self.audio.update()
+        if self.state == "playing" and self.audio.enabled:
+            self.audio.play_music()
+        prof.lap('audio')
+        if not self.renderer.dirty:
             self.sky.update(dt)
-
-            if self.state == "playing":
-                if self.audio.enabled:
-                    self.audio.play_music()
-                self.player.update(dt, keys)
-                if (keys[pygame.K_SPACE] or keys[pygame.K_UP]) and self.player.rapid_timer > 0:
-                    self.player.shoot(self.bullets, audio=self.audio)
-                self.bullets.update(dt)
-                self.enemy_bullets.update(dt)
-                self.powerups.update(dt)
-                self.particles.update(dt)
-                self.update_enemies(dt)
-                self.handle_collisions(dt)
-            else:
-                self.particles.update(dt*0.6)
-                self.powerups.update(dt*0.6)
-
-            # Screen shake
-            ox = oy = 0
-            if self.shake_timer > 0:
-                self.shake_timer -= dt
-                amp = 4
-                ox = int((random.random()-0.5) * 2 * amp)
-                oy = int((random.random()-0.5) * 2 * amp)
-
-            # Draw
-            self.sky.draw(self.screen)
-            for g in (self.powerups, self.enemy_group, self.boss_group, self.bullets, self.enemy_bullets, self.player_group, self.particles):
-                for spr in g:
-                    self.screen.blit(spr.image, spr.rect.move(ox, oy))
-            self.player.draw_extras(self.screen, self.world_time)
-
-            self.draw_hud(self.screen)
-
-            if self.state == "menu":
-                self.draw_center_text([
-                    ("SPACE BLUE SKY +", (255, 255, 255)),
-                    ("", WHITE),
-                    ("Flechas/A-D mover, Espacio disparar", (235, 245, 255)),
-                    ("P pausar", (235, 245, 255)),
-                    ("ENTER/ESPACIO para empezar", (255, 255, 180)),
-                ])
-            elif self.state == "paused":
-                self.draw_center_text([
-                    ("PAUSA", (255, 255, 255)),
-                    ("Pulsa P para reanudar", (255, 255, 180)),
-                ])
-            elif self.state == "gameover":
-                self.draw_center_text([
-                    ("GAME OVER", (255, 180, 180)),
-                    (f"Puntuación: {self.score}", (235, 245, 255)),
-                    (f"Oleada alcanzada: {self.level}", (235, 245, 255)),
-                    ("ENTER/ESPACIO para reiniciar", (255, 255, 180)),
-                ])
-
-            pygame.display.flip()
+        elif self.state == "playing":
+            # Con rectángulos sucios mover el fondo invalida toda la pantalla: fuera de la partida
+            # (menú, pausa, game over) el cielo se queda quieto y en ella avanza a DIRTY_SKY_HZ
+            self.sky_time += dt
+            if self.sky_time >= 1.0 / DIRTY_SKY_HZ:
+                self.sky.update(self.sky_time)
+                self.sky_time = 0.0
+        prof.lap('sky')
+        self.step(min(dt, MAX_FRAME_DT), keyboard_actions(keys, shoot, pause, restart))
+        # fracción del tick en curso; fuera de partida no se mueve nada que interpolar
+        alpha = self.accumulator / self.tick_dt if self.state == "playing" else 1.0
+
+        # Screen shake
+        ox = oy = 0
+        if self.shake_timer > 0:
+            amp = 4
+            shake = self.rng['shake']
+            ox = int((shake.random()-0.5) * 2 * amp)
+            oy = int((shake.random()-0.5) * 2 * amp)
+
+        # Draw
+        r = self.renderer
+        r.begin(*self.sky.background())
+        r.extend(self.sky.blit_sequence())
+        if not r.dirty:
+            # el cielo va en su propio lote para poder medirlo aparte de los sprites
+            r.flush()
+        prof.lap('sky')
+        r.add_sprites(self.powerups, ox, oy, alpha)
+        if self.composite_formation:
+            r.extend(self.formation.blit_sequence(ox, oy, alpha))
+            for hole in self.formation.take_holes(alpha):
+                r.invalidate(hole.move(ox, oy))
+        else:
+            r.add_sprites(self.enemy_group, ox, oy, alpha)
+        for g in (self.boss_group, self.bullets):
+            r.add_sprites(g, ox, oy, alpha)
+        r.extend(self.enemy_bullets.blit_sequence(ox, oy, alpha))
+        r.add_sprites(self.player_group, ox, oy, alpha)
+        r.extend(self.particles.blit_sequence(ox, oy))
+        r.end()
+        prof.lap('sprites')
+        px, py = self.player.draw_pos(alpha)
+        for rect in self.player.draw_extras(self.screen, self.world_time, (px + ox, py + oy)):
+            r.mark(rect)
+
+        center = None
+        if self.state == "menu":
+            center = ([
+                ("SPACE BLUE SKY +", (255, 255, 255)),
+                ("", WHITE),
+                ("Flechas/A-D mover, Espacio disparar", (235, 245, 255)),
+                ("P pausar", (235, 245, 255)),
+                ("ENTER/ESPACIO para empezar", (255, 255, 180)),
+            ],)
+        elif self.state == "paused":
+            center = ([
+                ("PAUSA", (255, 255, 255)),
+                ("Pulsa P para reanudar", (255, 255, 180)),
+            ],)
+        elif self.state == "gameover":
+            center = ([
+                ("GAME OVER", (255, 180, 180)),
+                (f"Puntuación: {self.score}", (235, 245, 255)),
+                (f"Oleada alcanzada: {self.level}", (235, 245, 255)),
+                ("ENTER/ESPACIO para reiniciar", (255, 255, 180)),
+            ],)
+        self.draw_hud(self.screen, center)
+        prof.lap('hud')
+
+        if self.show_profiler:
+            self.draw_profiler(self.screen)
+        prof.lap('overlay')
+
+        self.renderer.present()
+        prof.lap('flip')
+        prof.end()
+        if self.time_to_first_frame is None:
+            self.time_to_first_frame = time.perf_counter() - self.boot_time
+
+    def toggle_pause(self):
+        if self.state == "playing":
+            self.state = "paused"
+            if self.audio.enabled:
+                self.audio.pause_all()
+        else:
+            self.state = "playing"
+            if self.audio.enabled:
+                self.audio.resume_all()
 
     def reset(self):
         self.player = Player()
         self.player_group = pygame.sprite.GroupSingle(self.player)
         self.enemy_group.empty()
         self.boss_group.empty()
-        self.bullets.empty()
+        # las balas y power-ups en vuelo vuelven a su Pool (kill), no se pierden con empty()
+        for grp in (self.bullets, self.powerups):
+            for spr in grp.sprites():
+                spr.kill()
         self.enemy_bullets.empty()
         self.particles.empty()
-        self.powerups.empty()
         self.score = 0
         self.level = 1
+        self.last_hit = None
         self.spawn_wave(self.level)
         self.state = "playing"
         if self.audio.enabled:
             self.audio.play_music()
 
 
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Space Blue Sky + - Invaders")
+    ap.add_argument('--dirty', action='store_true', help="redibujado por rectángulos sucios (displays por software)")
+    ap.add_argument('--fps', type=int, default=FPS, help="tope de FPS de dibujado (no cambia la jugabilidad)")
+    ap.add_argument('--sim-hz', type=int, default=SIM_HZ, help="ticks de simulación por segundo")
+    ap.add_argument('--seed', type=int, default=None, help="semilla de la partida (por defecto, una al azar)")
+    ap.add_argument('--record', metavar='FICHERO', help="graba la entrada de cada tick para reproducir la partida después")
+    ap.add_argument('--replay', metavar='FICHERO', help="reproduce una partida grabada con --record (ignora el teclado)")
+    ap.add_argument('--profile', action='store_true', help="empieza con el overlay de rendimiento visible (F3)")
+    ap.add_argument('--profile-out', metavar='FICHERO',
+                    help="al salir, guarda los tiempos por fase (.json, o .csv según la extensión)")
+    args = ap.parse_args(argv)
+    replay = InputReplay(args.replay) if args.replay else None
     pygame.init()
     pygame.display.set_caption("Space Blue Sky + - Invaders")
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    game = Game(screen)
-    game.run()
+    if replay:
+        # la partida la fijan la semilla y los ticks por segundo de la grabación
+        game = Game(screen, dirty_rects=args.dirty, fps=args.fps, sim_hz=replay.sim_hz, seed=replay.seed)
+        game.replay = replay
+    else:
+        game = Game(screen, dirty_rects=args.dirty, fps=args.fps, sim_hz=args.sim_hz, seed=args.seed)
+    if args.record:
+        game.recorder = InputRecorder(game.seed, game.sim_hz)
+    game.show_profiler = args.profile
+    try:
+        game.run()
+    finally:
+        if args.record:
+            game.recorder.save(args.record)
+        if args.profile_out:
+            game.profiler.export(args.profile_out)
 
 
 if __name__ == "__main__":
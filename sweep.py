@@ -0,0 +1,243 @@
+# sweep.py
+# Barrido de dificultad: juega miles de partidas sin ventana con el piloto automático, en
+# paralelo en todos los núcleos, variando las curvas de Difficulty (oleadas y jefe) y la
+# habilidad del piloto. Cada partida se escribe al terminar como una línea JSON en --out, así
+# que la memoria no crece con el tamaño del barrido; al final se muestra un resumen por
+# configuración y oleada: cuántas partidas llegan, cuánto aguantan, cuánto puntúan y de qué
+# se muere.
+#
+#   python sweep.py --games 500 --skill 0.7,0.9,1.0 --vary enemy_speed_step=8,12,16 \
+#                   --vary boss_hp=100,150,200 --out barrido.jsonl
+#   python sweep.py --summarize barrido.jsonl
+#
+# Las mismas semillas se repiten en todas las configuraciones, así las diferencias entre
+# ellas no son ruido de la semilla.
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from headless import Autopilot
+from space_bluesky_plus import Actions, Difficulty, Game, SIM_HZ
+
+CAUSES = ('enemy', 'boss', 'invasion', 'timeout')
+
+
+# ------------------------------
+# Una partida (en un proceso del pool)
+# ------------------------------
+def _init_worker():
+    pygame.init()
+
+
+def play(job):
+    """Juega la partida descrita por `job` hasta el game over o el tope de tiempo; devuelve
+    su registro (un dict serializable a JSON) con los datos de cada oleada."""
+    seed, skill, params, minutes, sim_hz = job
+    game = Game(None, sim_hz=sim_hz, seed=seed, difficulty=Difficulty(**params))
+    pilot = Autopilot(skill=skill, seed=seed)
+    dt = game.tick_dt
+    game.step(dt, Actions(restart=True))   # del menú a la partida, como desde el teclado
+    limit = round(minutes * 60 * sim_hz)
+    waves = []
+
+    def open_wave():
+        return {'level': game.level, 'start': game.ticks, 'score': game.score,
+                'hits': collections.Counter()}
+
+    def close_wave(w, cleared):
+        waves.append({'level': w['level'], 'seconds': (game.ticks - w['start']) * dt,
+                      'score': game.score - w['score'], 'cleared': cleared, 'hits': dict(w['hits'])})
+
+    wave = open_wave()
+    lives = game.player.lives
+    while game.state == "playing" and game.ticks < limit:
+        game.step(dt, pilot(game))
+        if game.player.lives < lives:
+            wave['hits'][game.last_hit] += 1
+            lives = game.player.lives
+        if game.level != wave['level']:
+            close_wave(wave, True)
+            wave = open_wave()
+    close_wave(wave, False)
+    return {
+        'seed': seed,
+        'skill': skill,
+        'params': params,
+        'score': game.score,
+        'max_level': game.level,
+        'seconds': game.ticks * dt,
+        'end': game.last_hit if game.state == "gameover" else 'timeout',
+        'waves': waves,
+    }
+
+
+# ------------------------------
+# Resumen
+# ------------------------------
+def config_label(skill, params):
+    return ' '.join([f"skill={skill}"] + [f"{k}={v}" for k, v in sorted(params.items())])
+
+
+class Summary:
+    """Agregados por configuración y oleada; se alimenta partida a partida con add()."""
+    def __init__(self):
+        self.configs = {}
+
+    def add(self, row):
+        label = config_label(row['skill'], row['params'])
+        c = self.configs.get(label)
+        if c is None:
+            c = self.configs[label] = {'games': 0, 'score': 0, 'max_level': 0, 'ends': collections.Counter(),
+                                       'waves': collections.defaultdict(lambda: {
+                                           'reached': 0, 'seconds': 0.0, 'cleared': 0, 'died': 0,
+                                           'score': 0, 'hits': collections.Counter()})}
+        c['games'] += 1
+        c['score'] += row['score']
+        c['max_level'] += row['max_level']
+        c['ends'][row['end']] += 1
+        for w in row['waves']:
+            agg = c['waves'][w['level']]
+            agg['reached'] += 1
+            agg['seconds'] += w['seconds']
+            agg['score'] += w['score']
+            agg['cleared'] += w['cleared']
+            agg['hits'].update(w['hits'])
+        last = row['waves'][-1]
+        if row['end'] != 'timeout':
+            c['waves'][last['level']]['died'] += 1
+
+    def format(self):
+        out = []
+        for label in sorted(self.configs):
+            c = self.configs[label]
+            n = c['games']
+            ends = '  '.join(f"{cause} {c['ends'][cause] / n:.0%}" for cause in CAUSES if c['ends'][cause])
+            out.append(f"\n{label}")
+            out.append(f"  {n} partidas  puntuación media {c['score'] / n:.0f}  oleada media {c['max_level'] / n:.2f}"
+                       f"  fin: {ends}")
+            out.append(f"  {'oleada':>6}{'llegan':>8}{'s/oleada':>10}{'superan':>9}{'mueren':>8}{'puntos':>8}"
+                       f"{'impactos/partida (enemy boss invasion)':>40}")
+            for level in sorted(c['waves']):
+                w = c['waves'][level]
+                r = w['reached']
+                hits = ' '.join(f"{w['hits'][cause] / r:.2f}" for cause in CAUSES[:3])
+                out.append(f"  {level:>6}{r / n:>8.0%}{w['seconds'] / r:>10.1f}{w['cleared'] / r:>9.0%}"
+                           f"{w['died'] / r:>8.0%}{w['score'] / r:>8.0f}{hits:>40}")
+        return '\n'.join(out)
+
+
+def summarize(path):
+    summary = Summary()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                summary.add(json.loads(line))
+    return summary
+
+
+# ------------------------------
+# Barrido
+# ------------------------------
+def jobs(games, skills, grid, minutes, sim_hz, seed):
+    """Una tupla por partida: producto cartesiano de habilidades y valores de `grid`."""
+    names = sorted(grid)
+    for skill in skills:
+        for values in itertools.product(*(grid[name] for name in names)):
+            params = dict(zip(names, values))
+            for i in range(games):
+                yield (seed + i, skill, params, minutes, sim_hz)
+
+
+def sweep(job_iter, out, workers=None, window=4, progress=None):
+    """Reparte las partidas entre `workers` procesos y escribe cada resultado en `out` (un
+    fichero abierto) en cuanto llega. Solo hay `window` partidas por proceso en vuelo, así
+    que ni los trabajos pendientes ni los resultados se acumulan. Devuelve el Summary."""
+    workers = workers or os.cpu_count() or 1
+    summary = Summary()
+    pending = set()
+    job_iter = iter(job_iter)
+    done = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            for job in itertools.islice(job_iter, workers * window - len(pending)):
+                pending.add(pool.submit(play, job))
+            if not pending:
+                break
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in finished:
+                row = fut.result()
+                out.write(json.dumps(row) + '\n')
+                summary.add(row)
+                done += 1
+                if progress:
+                    progress(done, row)
+    return summary
+
+
+def parse_values(text):
+    return [float(v) if '.' in v else int(v) for v in text.split(',')]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Barrido de dificultad de Space Blue Sky + con el piloto automático")
+    ap.add_argument('--games', type=int, default=200, help="partidas por configuración")
+    ap.add_argument('--skill', default='1.0', help="habilidades del piloto, separadas por comas (0-1)")
+    ap.add_argument('--vary', action='append', default=[], metavar='CAMPO=V1,V2,...',
+                    help=f"valores de un campo de Difficulty ({', '.join(Difficulty._fields)})")
+    ap.add_argument('--minutes', type=float, default=10.0, help="tope de minutos simulados por partida")
+    ap.add_argument('--sim-hz', type=int, default=SIM_HZ)
+    ap.add_argument('--seed', type=int, default=1, help="semilla de la primera partida de cada configuración")
+    ap.add_argument('--workers', type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    ap.add_argument('--out', default='sweep.jsonl', help="resultados, una partida por línea")
+    ap.add_argument('--summarize', metavar='FICHERO', help="solo resume un barrido ya hecho")
+    args = ap.parse_args(argv)
+
+    if args.summarize:
+        print(summarize(args.summarize).format())
+        return
+
+    grid = {}
+    for spec in args.vary:
+        name, _, values = spec.partition('=')
+        if name not in Difficulty._fields or not values:
+            ap.error(f"--vary {spec}: se espera CAMPO=V1,V2 con CAMPO uno de {', '.join(Difficulty._fields)}")
+        grid[name] = parse_values(values)
+    skills = parse_values(args.skill)
+    configs = len(skills)
+    for values in grid.values():
+        configs *= len(values)
+    total = configs * args.games
+    workers = args.workers or os.cpu_count() or 1
+    print(f"{configs} configuraciones x {args.games} partidas = {total} partidas en {workers} procesos -> {args.out}")
+
+    t0 = time.perf_counter()
+    simulated = [0.0]
+
+    def progress(done, row):
+        simulated[0] += row['seconds']
+        if done % 50 == 0 or done == total:
+            wall = time.perf_counter() - t0
+            print(f"\r{done}/{total} partidas  {done / wall:.1f} partidas/s  "
+                  f"{simulated[0] / wall:.0f} s simulados/s", end='', file=sys.stderr, flush=True)
+
+    with open(args.out, 'w', encoding='utf-8') as out:
+        summary = sweep(jobs(args.games, skills, grid, args.minutes, args.sim_hz, args.seed), out,
+                        workers=workers, progress=progress)
+    print(file=sys.stderr)
+    print(summary.format())
+
+
+if __name__ == '__main__':
+    main()
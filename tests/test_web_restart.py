@@ -0,0 +1,83 @@
+"""Reiniciar la partida web (Game.reset) no debe volver a construir nada caro: ni sintetizar
+sonido, ni tocar la caché de disco, ni crear cielo/audio/fuentes o cargar imágenes."""
+import collections
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pytest
+
+import chipsynth
+import main as web
+import soundcache
+
+
+@pytest.fixture(scope='module')
+def screen():
+    # sin pygame.quit() al terminar: las fuentes de ASSETS se comparten entre partidas y
+    # dejarían de ser válidas
+    pygame.init()
+    return pygame.display.set_mode((web.WIDTH, web.HEIGHT))
+
+
+@pytest.fixture
+def game(screen, tmp_path, monkeypatch):
+    # caché de sonidos vacía y propia del test
+    monkeypatch.setenv('SPACEBLUESKY_CACHE', str(tmp_path))
+    monkeypatch.setattr(web, '_sound_cache', None)
+    g = web.Game(screen, seed=1)
+    # los primeros frames terminan de preparar el audio pendiente
+    for _ in range(10):
+        g.frame(1 / 60)
+    return g
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Cuenta las llamadas a todo lo que construye recursos desde cero."""
+    counter = collections.Counter()
+
+    def spy(obj, name, label):
+        original = getattr(obj, name)
+
+        def wrapper(*args, **kwargs):
+            counter[label] += 1
+            return original(*args, **kwargs)
+        monkeypatch.setattr(obj, name, wrapper)
+
+    spy(chipsynth, 'square', 'chipsynth.square')
+    spy(chipsynth, 'noise', 'chipsynth.noise')
+    spy(soundcache.SoundCache, 'fetch', 'SoundCache.fetch')
+    spy(web.Sky, '__init__', 'Sky')
+    spy(web.Audio, '__init__', 'Audio')
+    spy(pygame.font, 'SysFont', 'SysFont')
+    spy(pygame.image, 'load', 'image.load')
+    return counter
+
+
+def test_reset_rebuilds_nothing(game, calls):
+    for _ in range(5):
+        game.state = 'playing'
+        game.score = 120
+        game.reset()
+        assert game.state == 'menu' and game.score == 0 and game.level == 1
+        game.frame(1 / 60)
+    assert not calls, dict(calls)
+
+
+def test_restart_from_game_over_rebuilds_nothing(game, calls):
+    for _ in range(5):
+        game.state = 'gameover'
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(10, 10)))
+        game.frame(1 / 60)
+        assert game.state == 'playing' and game.player.lives == 3 and game.score == 0
+    assert not calls, dict(calls)
+
+
+def test_spies_see_a_new_game(screen, calls):
+    # control: una partida nueva sí crea cielo y audio, así que los espías funcionan
+    web.Game(screen, seed=2)
+    assert calls['Sky'] == 1 and calls['Audio'] == 1